@@ -0,0 +1,26 @@
+"""
+Run the whole benchmark suite offline:
+
+    python -m benchmarks [module ...]
+
+Modules default to all of them, e.g. ``python -m benchmarks models parsing`` runs only those two.
+"""
+import importlib
+import platform
+import sys
+
+from capitalist import __version__
+
+MODULES = ('models', 'validation', 'auth', 'parsing')
+
+
+def main(names):
+    print('# python-capitalist {} on {} {}'.format(
+        __version__, platform.python_implementation(), platform.python_version()))
+    for name in names or MODULES:
+        print('## {}'.format(name))
+        importlib.import_module('benchmarks.bench_{}'.format(name)).main()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
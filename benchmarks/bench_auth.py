@@ -0,0 +1,33 @@
+"""
+RSA operations of the client: the encrypted password (fresh PKCS1 v1.5 ciphertext vs the cached blob) and
+batch signing.
+
+    python -m benchmarks.bench_auth
+"""
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from capitalist.auth import EncryptedPassword, Signer
+
+from .common import bench
+
+
+def main():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_numbers = private_key.public_key().public_numbers()
+    modulus, exponent = format(public_numbers.n, 'x'), format(public_numbers.e, 'x')
+
+    fresh = EncryptedPassword('secret', modulus, exponent)
+    cached = EncryptedPassword('secret', modulus, exponent, cache=True)
+    bench('EncryptedPassword.password', lambda: fresh.password)
+    bench('EncryptedPassword.password (cache=True)', lambda: cached.password)
+
+    signer = Signer(private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    for size in (1024, 1024 * 1024):
+        message = b'x' * size
+        bench('Signer.sign {} bytes'.format(size), lambda: signer.sign(message))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""
+Serialization of payments: the generic and the compiled ``as_batch_record`` of every payment class and
+assembly of whole batch texts from payment objects and from a columnar ``PaymentBatch``.
+
+    python -m benchmarks.bench_models
+"""
+from capitalist.batch import PaymentBatch
+from capitalist.models import BasePayment, InternalPayment, serialize_many
+
+from .common import bench, payment_classes, sample_payment
+
+BATCH_SIZES = (10000, 100000, 1000000)
+
+
+def main():
+    for payment_class in payment_classes():
+        payment = sample_payment(payment_class)
+        bench('{}.as_batch_record generic'.format(payment_class.__name__),
+              lambda: BasePayment.as_batch_record(payment))
+        bench('{}.as_batch_record'.format(payment_class.__name__), payment.as_batch_record)
+
+    for size in BATCH_SIZES:
+        payments = [sample_payment(InternalPayment, i) for i in range(size)]
+        bench('batch text {} records generic'.format(size),
+              lambda: '\n'.join([BasePayment.as_batch_record(payment) for payment in payments]), number=1, repeat=3)
+        bench('serialize_many {} records'.format(size), lambda: serialize_many(payments), number=1, repeat=3)
+        batch = PaymentBatch.from_payments(InternalPayment, payments)
+        del payments
+        bench('PaymentBatch text {} records'.format(size), batch.as_batch_text, number=1, repeat=3)
+        del batch
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Decoding and model parsing of large responses: stdlib json vs orjson (when installed), and JSON to models.
+
+    python -m benchmarks.bench_parsing
+"""
+import json
+
+from capitalist.models import Account, BatchRecordInfo, CurrencyRate
+
+from .common import bench
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def accounts_payload(count):
+    return json.dumps({'code': 0, 'message': '', 'data': {'accounts': [
+        {'name': 'Account {}'.format(i), 'balance': 1234.56 + i, 'blockedAmount': '10.00',
+         'currency': ('USD', 'EUR', 'RUR', 'BTC')[i % 4], 'number': 'U{:07d}'.format(i)}
+        for i in range(count)]}}).encode('utf-8')
+
+
+def rates_payload(count):
+    return json.dumps({'code': 0, 'message': '', 'data': {'rates': {
+        type_: [{'amount': 60.5 + i / 100, 'amountCur': 'RUR', 'target': 'C{:02d}'.format(i % 100)} for i in range(count)]
+        for type_ in CurrencyRate.TYPES}}}).encode('utf-8')
+
+
+def batch_info_payload(count):
+    return json.dumps({'code': 0, 'message': '', 'data': {'records': [
+        {'internalId': str(i), 'state': 'PROCESSED', 'data': 'CAPITALIST;R0000001;10.00;RUR;{};payout'.format(i)}
+        for i in range(count)]}}).encode('utf-8')
+
+
+def main():
+    payloads = {
+        'get_accounts 10k': (accounts_payload(10000), 'accounts', Account),
+        'get_batch_info 50k': (batch_info_payload(50000), 'records', BatchRecordInfo),
+    }
+    for name, (payload, key, model) in payloads.items():
+        bench('json.loads {}'.format(name), lambda: json.loads(payload), repeat=3)
+        if orjson is not None:
+            bench('orjson.loads {}'.format(name), lambda: orjson.loads(payload), repeat=3)
+        items = json.loads(payload)['data'][key]
+        bench('{}.parse_json {}'.format(model.__name__, name), lambda: [model.parse_json(item) for item in items],
+              repeat=3)
+
+    rates = json.loads(rates_payload(10000))['data']['rates']['buy']
+    bench('CurrencyRate.parse_json currency_rates 10k',
+          lambda: [CurrencyRate.parse_json(item, type_='buy') for item in rates], repeat=3)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""
+Local pre-validation of large batches with ``BatchValidator``, from payment objects and from a ``PaymentBatch``,
+and card classification with ``guess_card_type``.
+
+    python -m benchmarks.bench_validation
+"""
+from capitalist.batch import PaymentBatch
+from capitalist.models import CardRussianPayment, InternalPayment
+from capitalist.utils import guess_card_type, guess_card_types
+from capitalist.validation import BatchValidator, is_luhn_valid
+
+from .common import bench, sample_payment
+
+BATCH_SIZES = (10000, 100000)
+
+
+def main():
+    bench('is_luhn_valid', lambda: is_luhn_valid('4276000011112223'))
+    bench('guess_card_type', lambda: guess_card_type('2200000011112222'))
+    card_numbers = ['{}{:012d}'.format(2200 + i % 8, i * 7919) for i in range(max(BATCH_SIZES))]
+    bench('guess_card_types {} cards'.format(len(card_numbers)), lambda: guess_card_types(card_numbers),
+          number=1, repeat=3)
+    validator = BatchValidator()
+    for payment_class in (InternalPayment, CardRussianPayment):
+        for size in BATCH_SIZES:
+            payments = [sample_payment(payment_class, i) for i in range(size)]
+            bench('validate {} {} payments'.format(payment_class.__name__, size),
+                  lambda: validator.validate(payments), number=1, repeat=3)
+            batch = PaymentBatch.from_payments(payment_class, payments)
+            bench('validate {} PaymentBatch {}'.format(payment_class.__name__, size),
+                  lambda: validator.validate(batch), number=1, repeat=3)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Helpers shared by the benchmark scripts. Results are printed one per line as
+``<name> <per-call time> <calls>`` so runs can be compared with plain diff tools.
+"""
+import timeit
+
+from capitalist import models
+
+
+def bench(name, func, number=None, repeat=5):
+    """Time ``func`` and print the best per-call time over ``repeat`` runs."""
+    timer = timeit.Timer(func)
+    if number is None:
+        number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+    print('{:<50} {:>12.3f} us {:>10}'.format(name, best * 1e6, number))
+    return best
+
+
+def sample_payment(payment_class, i=0):
+    """A payment of ``payment_class`` with every field filled in."""
+    common = (1000 + i % 1000, 'RUR', 'ID{}'.format(i), 'Payout #{}'.format(i))
+    if payment_class is models.InternalPayment:
+        return payment_class('R0000001', *common)
+    if payment_class is models.WebMoneyPayment:
+        return payment_class('Z123456789012', *common, protection_code='1234', protection_period=3)
+    if payment_class is models.CardRussianPayment:
+        return payment_class('4276000011112223', *common, 'IVAN', 'IVANOV')
+    if issubclass(payment_class, models.CardWorldwidePayment):
+        return payment_class(
+            '4111111111111111', *common, 'JOHN', 'DOE', '1990-01-01', 'Main st. 1', 'US', 'New York', '12', '2030')
+    if payment_class in (models.Card2CardRussianPayment, models.CardUkrainianPayment):
+        return payment_class('4276000011112223', *common)
+    return payment_class('79001234567', *common)
+
+
+def payment_classes():
+    """Every concrete payment class of ``capitalist.models``."""
+    found, pending = [], [models.BasePayment]
+    while pending:
+        for subclass in pending.pop(0).__subclasses__():
+            if subclass.__module__ == models.__name__:
+                found.append(subclass)
+            pending.append(subclass)
+    return found
@@ -0,0 +1,34 @@
+"""
+Hammer one shared Capitalist client from many threads against a local stub server and check that the token
+is requested once and every call succeeds.
+
+    python -m benchmarks.stress_threads [threads] [calls]
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from capitalist import Capitalist
+
+from .stub_server import StubServer
+
+
+def main(threads=64, calls=2000):
+    server = StubServer().start()
+    cap = Capitalist('login', 'password', request_executor_kwargs={'api_url': server.url, 'pool_maxsize': threads})
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(lambda _: cap.accounts(), range(calls)))
+    elapsed = time.monotonic() - started
+    server.shutdown()
+
+    assert all(accounts[0].number == 'U0000001' for accounts in results)
+    assert server.calls['get_token'] == 1, server.calls
+    assert server.calls['get_accounts'] == calls, server.calls
+    print('{} calls from {} threads in {:.2f}s ({:.0f} calls/s), get_token called once'.format(
+        calls, threads, elapsed, calls / elapsed))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,60 @@
+"""
+Minimal local stand-in for api.capitalist.net used by the stress scripts. Counts calls per operation.
+"""
+import json
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')
+        data = {key: values[0] for key, values in parse_qs(body).items()}
+        response = json.dumps(self.server.handle(data)).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 resets connections when the stress scripts connect from dozens of threads at once.
+    request_queue_size = 1024
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        public_numbers = rsa.generate_private_key(public_exponent=65537, key_size=2048).public_key().public_numbers()
+        self.modulus, self.exponent = format(public_numbers.n, 'x'), format(public_numbers.e, 'x')
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'http://{}:{}'.format(*self.server_address)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def handle(self, data):
+        operation = data.get('operation')
+        with self._lock:
+            self.calls[operation] += 1
+        if operation == 'get_token':
+            return {'code': 0, 'message': '', 'data': {
+                'token': 'token', 'modulus': self.modulus, 'exponent': self.exponent}}
+        if operation == 'get_accounts':
+            return {'code': 0, 'message': '', 'data': {'accounts': [{
+                'name': 'USD', 'balance': '100.00', 'blockedAmount': '0.00', 'currency': 'USD', 'number': 'U0000001'}]}}
+        return {'code': 0, 'message': '', 'data': {}}
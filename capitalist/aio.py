@@ -0,0 +1,262 @@
+"""
+Asyncio client for capitalist.net built on aiohttp.
+
+Install with ``pip install django4-capitalist[aio]``.
+"""
+import asyncio
+import itertools
+import logging
+from collections import deque
+from urllib.parse import urlencode
+
+import aiohttp
+
+from .auth import Authenticator, Signer
+from .capitalist import BaseCapitalist
+from .const import (
+    TIMEOUT, __version__, API_URL, CONNECTION_LIMIT, BATCH_MAX_RECORDS, BATCH_MAX_BYTES, BATCH_INFO_PAGE_SIZE,
+    BATCH_INFO_PREFETCH,
+)
+from .exceptions import CapitalistException, RequestException, ResponseException
+from .request_executor import BaseRequestExecutor, default_json_loads
+from .utils import BatchPages, chunk_batch_records
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRequestExecutor(BaseRequestExecutor):
+    """
+    Sends API calls through one aiohttp session, created lazily on the running event loop unless a ready
+    ``session`` is given. ``timeout`` applies to every call, whatever session is used.
+    """
+
+    def __init__(
+            self,
+            timeout=TIMEOUT,
+            api_url=API_URL,
+            session=None,
+            limit=CONNECTION_LIMIT,
+            circuit_breaker=None,
+            json_loads=default_json_loads,
+    ):
+        self.timeout = timeout
+        self.circuit_breaker = circuit_breaker
+        self.json_loads = json_loads
+        self.api_url = api_url
+        self.limit = limit
+        self.headers = {
+            'User-Agent': 'python-capitalist/{}'.format(__version__),
+            'X-Response-Format': 'json',
+        }
+        self._http = session
+
+    def _get_session(self):
+        # aiohttp sessions must be created inside a running event loop, so the default one is built lazily.
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.limit))
+        return self._http
+
+    async def close(self):
+        """Call close on the underlying session."""
+        if self._http is not None:
+            await self._http.close()
+
+    @staticmethod
+    def _form_data(data):
+        """Encode form values the way ``requests`` does: skip ``None``, decode bytes, stringify the rest."""
+        form = {}
+        for key, value in (data or {}).items():
+            if value is None:
+                continue
+            if isinstance(value, bytes):
+                value = value.decode('utf-8')
+            form[key] = str(value)
+        return form
+
+    async def request(self, **kwargs):
+        """Issue the HTTP request capturing any errors that may occur."""
+        operation = (kwargs.get('data') or {}).get('operation')
+        breaker, started = self._before_request(operation)
+        form = self._form_data(kwargs.get('data'))
+        try:
+            async with self._get_session().post(
+                    self.api_url, data=form, headers=self.headers,
+                    timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+                body = await response.read()
+            response_json = self.json_loads(body)
+        except Exception as exc:
+            self._request_failed(operation, breaker, exc)
+            raise RequestException(exc, kwargs, request_sent=not isinstance(exc, aiohttp.ClientConnectorError))
+        except BaseException:
+            self._request_cancelled(breaker)
+            raise
+        self._request_succeeded(operation, breaker, started, lambda: (len(urlencode(form)), len(body)))
+        return response_json
+
+
+class AsyncAuthenticator(Authenticator):
+    """
+    Authenticator for :class:`AsyncCapitalist`. Credentials are obtained with ``await get_credentials()``;
+    concurrent first calls share a single ``get_token`` request and proactive refreshes run as a task.
+    """
+
+    def __init__(self, request_executor, login, password, **kwargs):
+        super().__init__(request_executor, login, password, **kwargs)
+        self._setup_lock = None
+        self._refresh_task = None
+
+    async def _get_token(self):
+        json_data = await self.request_executor.request(data=self._token_request_data())
+        return self._check_token_response(json_data)
+
+    async def setup(self):
+        return self._apply_token_response(await self._get_token())
+
+    async def _refresh(self):
+        try:
+            await self.setup()
+        except CapitalistException:
+            logger.warning('Background token refresh failed', exc_info=True)
+
+    def refresh_in_background(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._refresh())
+
+    async def get_credentials(self):
+        credentials = self._credentials
+        if credentials is None or self.is_expired:
+            if self._setup_lock is None:
+                self._setup_lock = asyncio.Lock()
+            async with self._setup_lock:
+                credentials = self._credentials
+                if credentials is None or self.is_expired:
+                    credentials = await self.setup()
+        elif self.needs_refresh:
+            self.refresh_in_background()
+        return credentials
+
+    @property
+    def encrypted_password(self):
+        raise TypeError('Use "await get_credentials()" to get the credentials of an AsyncAuthenticator')
+
+    @property
+    def token(self):
+        raise TypeError('Use "await get_credentials()" to get the credentials of an AsyncAuthenticator')
+
+
+class AsyncCapitalist(BaseCapitalist):
+    """
+    Asyncio counterpart of :class:`capitalist.Capitalist`. All API operations are coroutines sharing one
+    pooled aiohttp session, so many calls can be in flight from a single event loop::
+
+        async with AsyncCapitalist(login, password) as cap:
+            accounts, rates = await asyncio.gather(cap.accounts(), cap.currency_rates())
+    """
+
+    def __init__(
+            self,
+            login,
+            password,
+            request_executor_class=AsyncRequestExecutor,
+            authenticator_class=AsyncAuthenticator,
+            signer_class=Signer,
+            private_key=None,
+            authenticator_kwargs=None,
+            retry_policy=None,
+            request_executor_kwargs=None,
+            metrics=None,
+    ):
+        super().__init__(
+            login, password, request_executor_class, authenticator_class, signer_class, private_key,
+            authenticator_kwargs, retry_policy, request_executor_kwargs, metrics)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        await self.request_executor.close()
+
+    async def _send_secure(self, operation, data, kwargs):
+        token, encrypted_password = await self.authenticator.get_credentials()
+        kwargs['data'] = self._secure_data(operation, data, token, encrypted_password)
+        try:
+            return self._check_response(await self.request_executor.request(**kwargs))
+        except ResponseException as exc:
+            if self.authenticator.is_token_error(exc):
+                self.authenticator.invalidate(token)
+            raise
+
+    async def _secure_request_once(self, operation, data, kwargs, attempts):
+        if next(attempts):
+            self.metrics.record_retry(operation)
+        try:
+            return await self._send_secure(operation, data, kwargs)
+        except ResponseException as exc:
+            self.metrics.record_error(operation, exc.code)
+            if not self.authenticator.is_token_error(exc):
+                raise
+        # The token was rejected and dropped: replay the call once with a fresh one.
+        return await self._send_secure(operation, data, kwargs)
+
+    async def secure_request(self, operation, data=None, **kwargs):
+        return await self.retry_policy.call_async(
+            self._secure_request_once, operation, data, kwargs, itertools.count(), operation=operation)
+
+    async def accounts(self):
+        return self._parse_accounts(await self.secure_request('get_accounts'))
+
+    async def currency_rates(self):
+        return self._parse_currency_rates(await self.secure_request('currency_rates'))
+
+    async def import_batch_advanced(self, payments, account_rur, account_usd, account_eur, account_btc):
+        # Building and signing a batch is CPU-bound, keep it off the event loop.
+        data = await asyncio.get_running_loop().run_in_executor(
+            None, self._import_batch_data, payments, account_rur, account_usd, account_eur, account_btc)
+        return await self.secure_request('import_batch_advanced', data)
+
+    async def iter_import_batch_chunked(
+            self, payments, account_rur, account_usd, account_eur, account_btc,
+            max_records=BATCH_MAX_RECORDS, max_bytes=BATCH_MAX_BYTES):
+        """Async generator counterpart of :meth:`capitalist.Capitalist.iter_import_batch_chunked`."""
+        loop = asyncio.get_running_loop()
+        for records in chunk_batch_records(payments, max_records, max_bytes):
+            data = await loop.run_in_executor(
+                None, self._signed_batch_data, '\n'.join(records), account_rur, account_usd, account_eur,
+                account_btc)
+            yield self._batch_id(await self.secure_request('import_batch_advanced', data))
+
+    async def get_document_fee(
+            self, document_type, source_account, amount, dest_account=None, wiretag=None):
+        data = self._document_fee_data(document_type, source_account, amount, dest_account, wiretag)
+        return await self.secure_request('get_document_fee', data)
+
+    async def get_batch_info(self, batch_id, page_size=1, start_offset=0):
+        return await self.secure_request('get_batch_info', self._batch_info_data(batch_id, page_size, start_offset))
+
+    async def iter_batch_records(
+            self, batch_id, page_size=BATCH_INFO_PAGE_SIZE, prefetch=BATCH_INFO_PREFETCH, start_offset=0):
+        """Async generator counterpart of :meth:`capitalist.Capitalist.iter_batch_records`."""
+        pages = BatchPages(page_size, prefetch, start_offset)
+        pending = deque()  # (offset, task) of the pages requested ahead
+        try:
+            while True:
+                for offset in pages.to_request(len(pending)):
+                    pending.append(
+                        (offset, asyncio.ensure_future(self.get_batch_info(batch_id, pages.page_size, offset))))
+                if not pending:
+                    break
+                offset, task = pending.popleft()
+                records = self._parse_batch_records(await task)
+                pages.received(offset, len(records))
+                if pages.done:
+                    for _, task in pending:
+                        task.cancel()
+                    pending.clear()
+                for record in records:
+                    yield record
+        finally:
+            for _, task in pending:
+                task.cancel()
@@ -1,3 +1,6 @@
+import logging
+import threading
+import time
 from base64 import b64encode
 
 from cryptography.hazmat.backends import default_backend
@@ -5,71 +8,214 @@ from cryptography.hazmat.primitives import serialization, hashes
 from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicNumbers
 
-from .exceptions import RequestException, ResponseException
-from .utils import retry
+from .const import TOKEN_TTL, TOKEN_REFRESH_MARGIN, TOKEN_ERROR_CODES
+from .exceptions import CapitalistException, ResponseException
+from .metrics import Metrics
+
+logger = logging.getLogger(__name__)
 
 
 class Authenticator:
-    def __init__(self, request_executor, login, password):
+    """
+    Holds the API token together with the password encrypted by the key issued alongside it.
+
+    The token is considered valid for ``token_ttl`` seconds. Once less than ``refresh_margin`` seconds are
+    left it is still served while a new one is fetched in a background thread, so callers only wait for
+    ``get_token`` on the very first request or after the token has actually expired.
+
+    A ``ResponseException`` with a code in ``token_error_codes`` drops the token, and the client replays the
+    call once with a new one. With ``match_token_messages`` an error whose message mentions the token counts
+    as well; it is off by default since any error may happen to mention a token.
+
+    Instances are thread-safe: when several threads need a token at once, only one of them requests it.
+    """
+    metrics = Metrics()
+
+    def __init__(
+            self,
+            request_executor,
+            login,
+            password,
+            token_ttl=TOKEN_TTL,
+            refresh_margin=TOKEN_REFRESH_MARGIN,
+            token_error_codes=TOKEN_ERROR_CODES,
+            match_token_messages=False,
+            cache_encrypted_password=False,
+    ):
         self.request_executor = request_executor
         self.login = login
         self.password = password
-        self._encrypted_password = None
-        self._token = None
+        self.token_ttl = token_ttl
+        self.refresh_margin = refresh_margin
+        self.token_error_codes = frozenset(token_error_codes)
+        self.match_token_messages = match_token_messages
+        self.cache_encrypted_password = cache_encrypted_password
+        # (token, EncryptedPassword) pair, replaced as a whole so readers never see a mismatched couple.
+        self._credentials = None
+        self._issued_at = None
+        self._setup_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # Guards replacing and clearing the credentials, which also happens outside of _setup_lock.
+        self._state_lock = threading.Lock()
 
-    @retry((RequestException, ResponseException))
-    def _get_token(self):
-        data = {
+    def _token_request_data(self):
+        return {
             'operation': 'get_token',
             'login': self.login,
         }
-        json_data = self.request_executor.request(data=data)
+
+    @staticmethod
+    def _check_token_response(json_data):
         code = json_data['code']
         if code != 0:
             raise ResponseException(code, json_data['message'])
         return json_data
 
+    def _apply_token_response(self, token_response):
+        encrypted_password = EncryptedPassword(
+            self.password, token_response['data']['modulus'], token_response['data']['exponent'],
+            cache=self.cache_encrypted_password)
+        if encrypted_password.cache:
+            # Pay for the encryption here, which is off the request path when refreshing in the background.
+            encrypted_password.password
+        credentials = (token_response['data']['token'], encrypted_password)
+        with self._state_lock:
+            self._credentials = credentials
+            self._issued_at = time.monotonic()
+        self.metrics.record_token_refresh()
+        return credentials
+
+    def _get_token(self):
+        json_data = self.request_executor.request(data=self._token_request_data())
+        return self._check_token_response(json_data)
+
     def setup(self):
-        token_response = self._get_token()
-        self._token = token_response['data']['token']
-        self._encrypted_password = EncryptedPassword(
-            self.password, token_response['data']['modulus'], token_response['data']['exponent'])
+        return self._apply_token_response(self._get_token())
 
     @property
-    def encrypted_password(self):
-        if self._encrypted_password is None:
+    def token_age(self):
+        """Seconds since the current token was issued, ``None`` if there is no token yet."""
+        issued_at = self._issued_at
+        if issued_at is None:
+            return None
+        return time.monotonic() - issued_at
+
+    @property
+    def is_expired(self):
+        age = self.token_age
+        return age is None or age >= self.token_ttl
+
+    @property
+    def needs_refresh(self):
+        age = self.token_age
+        return age is None or age >= self.token_ttl - self.refresh_margin
+
+    def is_token_error(self, exc):
+        """Whether a ``ResponseException`` means the token was rejected and a new one should be requested."""
+        if exc.code in self.token_error_codes:
+            return True
+        return self.match_token_messages and 'token' in str(exc.message or '').lower()
+
+    def invalidate(self, token=None):
+        """
+        Drop the current token so the next call fetches a new one. When ``token`` is given, only drop it
+        if it is still the current one: another caller may have already replaced it.
+        """
+        with self._state_lock:
+            credentials = self._credentials
+            if credentials is not None and (token is None or credentials[0] == token):
+                self._credentials = None
+                self._issued_at = None
+
+    def _refresh(self):
+        try:
             self.setup()
-        return self._encrypted_password
+        except CapitalistException:
+            logger.warning('Background token refresh failed', exc_info=True)
+        finally:
+            self._refresh_lock.release()
+
+    def refresh_in_background(self):
+        """Start fetching a new token in a daemon thread unless a refresh is already running."""
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            threading.Thread(target=self._refresh, name='capitalist-token-refresh', daemon=True).start()
+        except BaseException:
+            self._refresh_lock.release()
+            raise
+
+    def get_credentials(self):
+        """Return a consistent ``(token, encrypted_password)`` pair, fetching or refreshing it when needed."""
+        # Read the pair once: another thread may invalidate it between the checks and the return.
+        credentials = self._credentials
+        if credentials is None or self.is_expired:
+            with self._setup_lock:
+                credentials = self._credentials
+                if credentials is None or self.is_expired:
+                    credentials = self.setup()
+        elif self.needs_refresh:
+            self.refresh_in_background()
+        return credentials
+
+    @property
+    def encrypted_password(self):
+        return self.get_credentials()[1]
 
     @property
     def token(self):
-        if self._token is None:
-            self.setup()
-        return self._token
+        return self.get_credentials()[0]
 
 
 class EncryptedPassword:
     """
     PKCS1 v1.5 encrypted password.
+
+    By default every access to ``password`` produces a fresh ciphertext. With ``cache=True`` the password is
+    encrypted once and the same blob is reused for as long as the key (i.e. the token) lives.
     """
 
-    def __init__(self, password, modulus, exponent):
+    def __init__(self, password, modulus, exponent, cache=False):
         self._password = password.encode('utf-8')
         modulus = int(modulus, 16)
         exponent = int(exponent, 16)
         public_numbers = RSAPublicNumbers(exponent, modulus)
         self.public_key = public_numbers.public_key(default_backend())
+        self.cache = cache
+        self._encrypted = None
+
+    def encrypt(self):
+        return self.public_key.encrypt(self._password, padding.PKCS1v15()).hex()
 
     @property
     def password(self):
-        return self.public_key.encrypt(self._password, padding.PKCS1v15()).hex()
+        if not self.cache:
+            return self.encrypt()
+        if self._encrypted is None:
+            self._encrypted = self.encrypt()
+        return self._encrypted
 
 
 class Signer:
     def __init__(self, private_key: bytes):
+        # Kept so the signer can be rebuilt in worker processes, loaded keys cannot be pickled.
+        self.private_key = private_key
         self._key = serialization.load_pem_private_key(private_key, None, default_backend())
 
     def sign(self, message):
         signature = self._key.sign(message, padding.PKCS1v15(), hashes.SHA1())
         signature = b64encode(signature)
         return signature
+
+
+_process_signer = None
+
+
+def init_process_signer(signer_class, private_key):
+    """``ProcessPoolExecutor`` initializer loading the signing key once per worker process."""
+    global _process_signer
+    _process_signer = signer_class(private_key)
+
+
+def sign_in_process(message):
+    return _process_signer.sign(message)
@@ -0,0 +1,127 @@
+from collections.abc import Mapping
+from itertools import repeat
+
+from .models import BasePayment
+
+
+class PaymentBatch:
+    """
+    Column-oriented container of payments of one kind.
+
+    Instead of one object per payment, a batch keeps a list per field of ``payment_class`` (its ``__slots__``)
+    and serializes all rows in one pass over the columns. Use it in place of a list of payments for large
+    payouts; the import methods of the clients accept it directly.
+
+        batch = PaymentBatch(InternalPayment)
+        batch.append('R0000001', 100, 'RUR', 'ID1', 'Payout #1')
+        batch = PaymentBatch.from_columns(InternalPayment, frame, currency='RUR')
+
+    Values are stringified as they are by ``as_batch_record``; missing values have to be ``None``.
+    """
+
+    def __init__(self, payment_class):
+        if not (isinstance(payment_class, type) and issubclass(payment_class, BasePayment)):
+            raise TypeError('{!r} is not a payment class'.format(payment_class))
+        if payment_class.codename is None:
+            raise TypeError('{} has no codename'.format(payment_class.__name__))
+        self.payment_class = payment_class
+        self.fields = tuple(payment_class.__slots__)
+        self.columns = {field: [] for field in self.fields}
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def __repr__(self):
+        return '<PaymentBatch {} x {}>'.format(self.payment_class.__name__, self._length)
+
+    def _column_list(self):
+        return [self.columns[field] for field in self.fields]
+
+    def append(self, *args, **kwargs):
+        """Add a payment given the arguments of the payment class constructor; omitted fields are ``None``."""
+        if len(args) > len(self.fields):
+            raise TypeError('{} takes at most {} fields, {} given'.format(
+                self.payment_class.__name__, len(self.fields), len(args)))
+        values = args + tuple(kwargs.pop(field, None) for field in self.fields[len(args):])
+        if kwargs:
+            raise TypeError('Unknown fields of {}: {}'.format(self.payment_class.__name__, ', '.join(kwargs)))
+        for column, value in zip(self._column_list(), values):
+            column.append(value)
+        self._length += 1
+
+    def append_payment(self, payment):
+        if not isinstance(payment, self.payment_class):
+            raise TypeError('Expected {}, got {}'.format(self.payment_class.__name__, type(payment).__name__))
+        for field, column in zip(self.fields, self._column_list()):
+            column.append(getattr(payment, field))
+        self._length += 1
+
+    def extend(self, rows):
+        """Add payments from an iterable of payment objects, mappings of field values or field value tuples."""
+        for row in rows:
+            if isinstance(row, BasePayment):
+                self.append_payment(row)
+            elif isinstance(row, Mapping):
+                self.append(**row)
+            else:
+                self.append(*row)
+
+    def extend_columns(self, columns, **constants):
+        """
+        Add payments from ``columns``, a mapping or DataFrame-like object indexed by field name, whose columns
+        are iterables of equal length. Fields passed in ``constants`` are the same for every added payment,
+        fields found in neither are ``None``.
+        """
+        unknown = set(constants).difference(self.fields)
+        if unknown:
+            raise TypeError('Unknown fields of {}: {}'.format(self.payment_class.__name__, ', '.join(unknown)))
+        values, length = {}, None
+        for field in self.fields:
+            if field not in constants and field in columns:
+                values[field] = list(columns[field])
+                if length is None:
+                    length = len(values[field])
+                elif len(values[field]) != length:
+                    raise ValueError('Column {} has {} values, expected {}'.format(field, len(values[field]), length))
+        if length is None:
+            raise ValueError('No column of {} found'.format(self.payment_class.__name__))
+
+        for field, column in zip(self.fields, self._column_list()):
+            if field in values:
+                column.extend(values[field])
+            else:
+                column.extend(repeat(constants.get(field), length))
+        self._length += length
+
+    @classmethod
+    def from_payments(cls, payment_class, payments):
+        batch = cls(payment_class)
+        batch.extend(payments)
+        return batch
+
+    @classmethod
+    def from_columns(cls, payment_class, columns, **constants):
+        batch = cls(payment_class)
+        batch.extend_columns(columns, **constants)
+        return batch
+
+    def iter_records(self):
+        """Lazily yield the batch record of every payment, like ``as_batch_record`` does for one payment."""
+        codename = str(self.payment_class.codename)
+        columns = self._column_list()
+        if self.payment_class.skip_none and any(None in column for column in columns):
+            return (
+                ';'.join([codename] + [str(value) for value in row if value is not None])
+                for row in zip(*columns)
+            )
+        format_record = self.payment_class._format_record
+        if format_record is not None:
+            return map(format_record, *columns)
+        return map(';'.join, zip(repeat(codename, self._length), *[map(str, column) for column in columns]))
+
+    def as_batch_records(self):
+        return list(self.iter_records())
+
+    def as_batch_text(self):
+        return '\n'.join(self.iter_records())
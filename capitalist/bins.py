@@ -0,0 +1,193 @@
+"""
+BIN (bank identification number) table used by :func:`capitalist.utils.guess_card_type`.
+
+A table maps card number prefixes to ``CARD_RU``, ``CARD_UA`` or ``CARD_WORLDWIDE``. It is compiled from a
+CSV file into a compact binary file of sorted, non-overlapping ranges of 8 digit BINs in which overlapping
+source entries are already resolved in favour of the longest prefix, so a lookup is one binary search::
+
+    python -m capitalist.bins bins.csv bins.bin
+
+The CSV has a ``prefix,type`` row per entry, the prefix being 1 to 8 digits or a ``low-high`` range of
+prefixes of the same length and the type one of ``RU``, ``UA``, ``WORLDWIDE``. The compiled file is opened
+with ``mmap``, so every process using it shares one copy through the page cache::
+
+    from capitalist.bins import BinTable, set_bin_table
+    set_bin_table(BinTable.open('bins.bin'))
+
+Without a table only the national card systems are known: MIR (2200-2204) and PROSTIR (9804).
+"""
+import csv
+import heapq
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+
+from .const import CARD_RU, CARD_UA, CARD_WORLDWIDE
+
+BIN_DIGITS = 8
+CARD_TYPES = {'RU': CARD_RU, 'UA': CARD_UA, 'WORLDWIDE': CARD_WORLDWIDE}
+
+_MAGIC = b'CBIN'
+_VERSION = 1
+_HEADER = struct.Struct('<4sII')
+
+DEFAULT_PREFIXES = (
+    ('2200-2204', CARD_RU),  # MIR
+    ('9804', CARD_UA),  # PROSTIR
+)
+
+
+def _prefix_range(prefix):
+    low, _, high = prefix.partition('-')
+    high = high or low
+    if not (low.isdecimal() and high.isdecimal() and len(low) == len(high) and 0 < len(low) <= BIN_DIGITS):
+        raise ValueError('Invalid BIN prefix {!r}'.format(prefix))
+    return int(low.ljust(BIN_DIGITS, '0')), int(high.ljust(BIN_DIGITS, '9'))
+
+
+def _flatten(entries):
+    """
+    Turn ``(prefix, card_type)`` entries into sorted, non-overlapping ``(start, end, card_type)`` ranges;
+    where entries overlap the narrowest one wins.
+    """
+    ranges = sorted((*_prefix_range(prefix), card_type) for prefix, card_type in entries)
+    flat = []
+    active = []  # heap of (width, end, card_type) of the ranges covering the current position
+    position, index = 0, 0
+    while index < len(ranges) or active:
+        if not active:
+            position = ranges[index][0]
+        while index < len(ranges) and ranges[index][0] <= position:
+            start, end, card_type = ranges[index]
+            heapq.heappush(active, (end - start, end, card_type))
+            index += 1
+        while active and active[0][1] < position:
+            heapq.heappop(active)
+        if not active:
+            continue
+        _, end, card_type = active[0]
+        # The winner holds until it ends or a range starts that may be narrower.
+        stop = min(end, ranges[index][0] - 1) if index < len(ranges) else end
+        if flat and flat[-1][2] == card_type and flat[-1][1] == position - 1:
+            flat[-1] = (flat[-1][0], stop, card_type)
+        else:
+            flat.append((position, stop, card_type))
+        position = stop + 1
+        while active and active[0][1] < position:
+            heapq.heappop(active)
+    return flat
+
+
+class BinTable:
+    """
+    Longest-prefix BIN lookup over a compiled table held in any buffer: a memory-mapped file
+    (:meth:`open`) or bytes built in memory (:meth:`from_prefixes`).
+    """
+
+    def __init__(self, buffer):
+        magic, version, count = _HEADER.unpack_from(buffer)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError('Not a BIN table of version {}'.format(_VERSION))
+        view = memoryview(buffer)
+        offset = _HEADER.size
+        self.starts = self._uint32s(view[offset:offset + 4 * count])
+        self.ends = self._uint32s(view[offset + 4 * count:offset + 8 * count])
+        self.types = view[offset + 8 * count:offset + 9 * count]
+        self._buffer = buffer
+
+    @staticmethod
+    def _uint32s(view):
+        if sys.byteorder == 'little':
+            return view.cast('I')
+        # The file is little-endian: big-endian hosts get a private, byte-swapped copy.
+        values = array('I', view)
+        values.byteswap()
+        return values
+
+    @staticmethod
+    def compile(entries):
+        """Compiled table of ``(prefix, card_type)`` entries as bytes."""
+        flat = _flatten(entries)
+        starts = array('I', (start for start, _, _ in flat))
+        ends = array('I', (end for _, end, _ in flat))
+        if sys.byteorder != 'little':
+            starts.byteswap()
+            ends.byteswap()
+        types = bytes(card_type for _, _, card_type in flat)
+        return _HEADER.pack(_MAGIC, _VERSION, len(flat)) + starts.tobytes() + ends.tobytes() + types
+
+    @classmethod
+    def from_prefixes(cls, entries):
+        return cls(cls.compile(entries))
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as file:
+            return cls(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @staticmethod
+    def read_csv(path):
+        """``(prefix, card_type)`` entries of a ``prefix,type`` CSV file."""
+        with open(path, newline='') as file:
+            for row in csv.reader(file):
+                if row and not row[0].startswith('#'):
+                    yield row[0].strip(), CARD_TYPES[row[1].strip().upper()]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def lookup_bin(self, bin_number):
+        """Card type of an 8 digit BIN given as ``int``, or ``None``."""
+        index = bisect_right(self.starts, bin_number) - 1
+        if index >= 0 and bin_number <= self.ends[index]:
+            return self.types[index]
+        return None
+
+    def lookup(self, card_number):
+        """Card type of a card number or of its leading digits (6 at least), or ``None``."""
+        digits = str(card_number).replace(' ', '')[:BIN_DIGITS]
+        if len(digits) < 6 or not digits.isdecimal():
+            return None
+        return self.lookup_bin(int(digits.ljust(BIN_DIGITS, '0')))
+
+    def lookup_many(self, card_numbers):
+        """Card types of ``card_numbers`` as a list; repeated BINs are looked up once."""
+        seen = {}
+        types = []
+        for card_number in card_numbers:
+            key = str(card_number).replace(' ', '')[:BIN_DIGITS]
+            if key not in seen:
+                seen[key] = self.lookup(key)
+            types.append(seen[key])
+        return types
+
+
+_default_table = None
+
+
+def get_bin_table():
+    """The table used by ``guess_card_type``: the one given to :func:`set_bin_table` or the built-in one."""
+    global _default_table
+    if _default_table is None:
+        _default_table = BinTable.from_prefixes(DEFAULT_PREFIXES)
+    return _default_table
+
+
+def set_bin_table(table):
+    """Use ``table`` (a :class:`BinTable` or the path of a compiled table) for ``guess_card_type``."""
+    global _default_table
+    _default_table = table if isinstance(table, BinTable) else BinTable.open(table)
+
+
+def main(argv):
+    source, target = argv
+    data = BinTable.compile(BinTable.read_csv(source))
+    with open(target, 'wb') as file:
+        file.write(data)
+    print('{}: {} ranges'.format(target, len(BinTable(data))))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,66 @@
+import threading
+import time
+from concurrent.futures import Future
+
+
+class ReadCache:
+    """
+    Coalesce concurrent identical calls and keep their results for ``ttl`` seconds.
+
+    The first caller of a key runs the function while callers arriving in the meantime wait for its
+    outcome, so a burst of identical reads costs one API request. Errors are shared with the waiting
+    callers but never cached. A result whose call was in flight during :meth:`invalidate` is not stored.
+    Expired results are dropped whenever a new one is stored, so keys used once do not pile up.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._in_flight = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get_or_call(self, key, func):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+            call = self._in_flight.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._in_flight[key] = Future()
+                generation = self._generation
+        if not is_leader:
+            return call.result()
+
+        try:
+            value = func()
+        except BaseException as exc:
+            with self._lock:
+                del self._in_flight[key]
+            call.set_exception(exc)
+            raise
+        with self._lock:
+            del self._in_flight[key]
+            if generation == self._generation:
+                now = time.monotonic()
+                self._purge(now)
+                # Re-inserted at the end, to keep the entries ordered by expiry.
+                self._entries.pop(key, None)
+                self._entries[key] = (now + self.ttl, value)
+        call.set_result(value)
+        return value
+
+    def _purge(self, now):
+        expired = []
+        for key, (expires, _) in self._entries.items():
+            if expires > now:
+                break
+            expired.append(key)
+        for key in expired:
+            del self._entries[key]
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
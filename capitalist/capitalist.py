@@ -1,16 +1,33 @@
+import copy
+import functools
+import itertools
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from decimal import Decimal
 from pathlib import Path
 from typing import Union
 
 from capitalist.exceptions import ResponseException
-from capitalist.models import Account, CurrencyRate
-from .auth import Authenticator, Signer
-from .exceptions import RequestException, ImproperlyConfigured
+from capitalist.models import Account, CurrencyRate, BatchRecordInfo, BatchSubmission, serialize_many
+from .auth import Authenticator, Signer, init_process_signer, sign_in_process
+from .cache import ReadCache
+from .const import (
+    BATCH_MAX_RECORDS, BATCH_MAX_BYTES, BULK_MAX_WORKERS, BATCH_INFO_PAGE_SIZE, BATCH_INFO_PREFETCH,
+)
+from .exceptions import ImproperlyConfigured
+from .metrics import Metrics
 from .request_executor import RequestExecutor
-from .utils import retry
+from .retry import RetryPolicy
+from .utils import BatchPages, chunk_batch_records
 
 
-class Capitalist:
+class BaseCapitalist:
+    """
+    Client configuration and request/response helpers shared by the sync and async clients.
+    """
+
     def __init__(
             self,
             login,
@@ -19,64 +36,86 @@ class Capitalist:
             authenticator_class=Authenticator,
             signer_class=Signer,
             private_key: Union[bytes, Path] = None,
+            authenticator_kwargs=None,
+            retry_policy=None,
+            request_executor_kwargs=None,
+            metrics=None,
     ):
         self.login = login
-        self.request_executor = request_executor_class()
-        self.authenticator = authenticator_class(self.request_executor, login, password)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.request_executor = request_executor_class(**(request_executor_kwargs or {}))
+        self.authenticator = authenticator_class(
+            self.request_executor, login, password, **(authenticator_kwargs or {}))
+        self.metrics = metrics or Metrics()
+        if metrics is not None:
+            self.request_executor.metrics = metrics
+            self.authenticator.metrics = metrics
         self.signer = None
         if private_key is not None:
             if isinstance(private_key, Path):
                 private_key = private_key.read_bytes()
             self.signer = signer_class(private_key)
 
-    @retry((RequestException,))
-    def secure_request(self, operation, data=None, **kwargs):
+    def _secure_data(self, operation, data, token, encrypted_password):
         if data is None:
             data = {}
         data.update({
             'operation': operation,
             'login': self.login,
-            'token': self.authenticator.token,
-            'encrypted_password': self.authenticator.encrypted_password.password,
+            'token': token,
+            'encrypted_password': encrypted_password.password,
         })
-        kwargs['data'] = data
-        response_json = self.request_executor.request(**kwargs)
+        return data
+
+    @staticmethod
+    def _check_response(response_json):
         code = response_json['code']
         if code != 0:
             raise ResponseException(code, response_json['message'])
         return response_json
 
-    def accounts(self):
-        json_data = self.secure_request('get_accounts')
+    @staticmethod
+    def _parse_accounts(json_data):
         return [Account.parse_json(acc_json) for acc_json in json_data['data']['accounts']]
 
-    def currency_rates(self):
-        json_data = self.secure_request('currency_rates')['data']['rates']
+    @staticmethod
+    def _parse_currency_rates(json_data):
+        json_data = json_data['data']['rates']
         rates = []
         for type_ in CurrencyRate.TYPES:
             for rate_data in json_data[type_]:
                 rates.append(CurrencyRate.parse_json(rate_data, type_=type_))
         return rates
 
-    def import_batch_advanced(self, payments, account_rur, account_usd, account_eur, account_btc):
+    def _import_batch_data(self, payments, account_rur, account_usd, account_eur, account_btc):
+        payment_data = serialize_many(payments)
+        return self._signed_batch_data(payment_data, account_rur, account_usd, account_eur, account_btc)
+
+    def _check_signer(self):
         if self.signer is None:
             raise ImproperlyConfigured('Provide private key and/or passphrase to be able to sign data.')
 
-        payment_data = '\n'.join([payment.as_batch_record() for payment in payments])
-        data = {
+    def _signed_batch_data(self, payment_data, account_rur, account_usd, account_eur, account_btc, signature=None):
+        if signature is None:
+            self._check_signer()
+            signature = self.signer.sign(payment_data.encode('utf-8'))
+
+        return {
             'batch': payment_data,
             'verification_type': 'SIGNATURE',
-            'verification_data': self.signer.sign(payment_data.encode('utf-8')),
+            'verification_data': signature,
             'account_RUR': account_rur,
             'account_USD': account_usd,
             'account_EUR': account_eur,
             'account_BTC': account_btc,
         }
-        return self.secure_request('import_batch_advanced', data)
 
-    def get_document_fee(
-            self, document_type: str, source_account: str, amount: Decimal, dest_account: str = None,
-            wiretag: str = None):
+    @staticmethod
+    def _batch_id(response_json):
+        return response_json['data']['id']
+
+    @staticmethod
+    def _document_fee_data(document_type, source_account, amount, dest_account=None, wiretag=None):
         data = {
             'document_type': document_type,
             'source_account': source_account,
@@ -86,12 +125,214 @@ class Capitalist:
             data['dest_account'] = dest_account
         if wiretag:
             data['wiretag'] = wiretag
-        return self.secure_request('get_document_fee', data)
+        return data
 
-    def get_batch_info(self, batch_id, page_size=1, start_offset=0):
-        data = {
+    @staticmethod
+    def _parse_batch_records(json_data):
+        return [BatchRecordInfo.parse_json(record) for record in json_data['data']['records']]
+
+    @staticmethod
+    def _batch_info_data(batch_id, page_size, start_offset):
+        return {
             'batch_id': batch_id,
             'page_size': page_size,
             'start_offset': start_offset,
         }
-        return self.secure_request('get_batch_info', data)
+
+
+class Capitalist(BaseCapitalist):
+    """
+    Synchronous capitalist.net client.
+
+    With ``read_cache_ttl`` (seconds) the pure reads ``accounts()``, ``currency_rates()`` and
+    ``get_document_fee()`` go through a :class:`capitalist.cache.ReadCache`: identical concurrent calls share
+    one request and results are reused until they expire or a batch is imported. Cached lists are copied for
+    every caller, the models inside them are shared; fee responses are plain dicts and are deep-copied.
+    """
+
+    def __init__(self, *args, read_cache_ttl=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.read_cache = ReadCache(read_cache_ttl) if read_cache_ttl else None
+
+    def _cached_read(self, key, func, *args):
+        if self.read_cache is None:
+            return func(*args)
+        return self.read_cache.get_or_call(key, functools.partial(func, *args))
+
+    def invalidate_reads(self):
+        """Drop cached read results, e.g. after balances changed outside of this client."""
+        if self.read_cache is not None:
+            self.read_cache.invalidate()
+
+    def _send_secure(self, operation, data, kwargs):
+        token, encrypted_password = self.authenticator.get_credentials()
+        kwargs['data'] = self._secure_data(operation, data, token, encrypted_password)
+        try:
+            return self._check_response(self.request_executor.request(**kwargs))
+        except ResponseException as exc:
+            if self.authenticator.is_token_error(exc):
+                self.authenticator.invalidate(token)
+            raise
+
+    def _secure_request_once(self, operation, data, kwargs, attempts):
+        if next(attempts):
+            self.metrics.record_retry(operation)
+        try:
+            return self._send_secure(operation, data, kwargs)
+        except ResponseException as exc:
+            self.metrics.record_error(operation, exc.code)
+            if not self.authenticator.is_token_error(exc):
+                raise
+        # The token was rejected and dropped: replay the call once with a fresh one.
+        return self._send_secure(operation, data, kwargs)
+
+    def secure_request(self, operation, data=None, **kwargs):
+        return self.retry_policy.call(
+            self._secure_request_once, operation, data, kwargs, itertools.count(), operation=operation)
+
+    def _accounts(self):
+        return self._parse_accounts(self.secure_request('get_accounts'))
+
+    def accounts(self):
+        return list(self._cached_read(('get_accounts',), self._accounts))
+
+    def _currency_rates(self):
+        return self._parse_currency_rates(self.secure_request('currency_rates'))
+
+    def currency_rates(self):
+        return list(self._cached_read(('currency_rates',), self._currency_rates))
+
+    def import_batch_advanced(self, payments, account_rur, account_usd, account_eur, account_btc):
+        data = self._import_batch_data(payments, account_rur, account_usd, account_eur, account_btc)
+        try:
+            return self.secure_request('import_batch_advanced', data)
+        finally:
+            self.invalidate_reads()
+
+    def iter_import_batch_chunked(
+            self, payments, account_rur, account_usd, account_eur, account_btc,
+            max_records=BATCH_MAX_RECORDS, max_bytes=BATCH_MAX_BYTES):
+        """
+        Submit payments from any iterable or a :class:`capitalist.batch.PaymentBatch` as a series of batches
+        of at most ``max_records`` records and ``max_bytes`` bytes each, yielding the batch ID of every
+        submitted chunk.
+
+        This is a generator: nothing is submitted until it is iterated, each chunk is submitted when the
+        next ID is requested, and chunks after the point where iteration stops are never submitted.
+        Payments are consumed lazily, so only one chunk is held in memory at a time. If a chunk fails,
+        the IDs yielded before the exception belong to batches that were already accepted.
+        """
+        for records in chunk_batch_records(payments, max_records, max_bytes):
+            data = self._signed_batch_data('\n'.join(records), account_rur, account_usd, account_eur, account_btc)
+            try:
+                response = self.secure_request('import_batch_advanced', data)
+            finally:
+                self.invalidate_reads()
+            yield self._batch_id(response)
+
+    def _submit_batch(self, submission, payment_data, accounts, signature_future, window):
+        try:
+            signature = signature_future.result() if signature_future is not None else None
+            data = self._signed_batch_data(payment_data, *accounts, signature=signature)
+            submission.response = self.secure_request('import_batch_advanced', data)
+            submission.batch_id = self._batch_id(submission.response)
+        except Exception as exc:
+            submission.error = exc
+        finally:
+            window.release()
+            self.invalidate_reads()
+        return submission
+
+    def import_batches(self, batches, max_workers=BULK_MAX_WORKERS, sign_processes=0):
+        """
+        Submit many independent batches concurrently.
+
+        ``batches`` is an iterable of ``(payments, account_rur, account_usd, account_eur, account_btc)``
+        tuples, i.e. the arguments of :meth:`import_batch_advanced`. Batches are signed by the sending
+        threads and sent by up to ``max_workers`` threads sharing this client's request executor.
+
+        ``sign_processes`` moves signing to a pool of that many worker processes (``None`` means one per CPU),
+        started with ``spawn`` so that no lock held by another thread of this process is inherited. Each batch
+        text is pickled to a worker, which costs about as much as signing it: a pool only pays off when
+        signing many large batches keeps the sending threads busy, and it adds its start-up time. At most
+        ``max_workers`` batches are built, signed or being sent at any time, so memory does not grow with the
+        number of batches.
+
+        Returns a list of :class:`capitalist.models.BatchSubmission` in the order of ``batches``; a failed
+        batch carries its exception in ``error`` and does not affect the others.
+        """
+        self._check_signer()
+        if sign_processes == 0:
+            sign_pool = None
+        else:
+            sign_pool = ProcessPoolExecutor(
+                sign_processes, mp_context=multiprocessing.get_context('spawn'), initializer=init_process_signer,
+                initargs=(type(self.signer), self.signer.private_key))
+
+        submissions, futures = [], []
+        window = threading.BoundedSemaphore(max_workers)
+        try:
+            with ThreadPoolExecutor(max_workers) as send_pool:
+                for index, (payments, *accounts) in enumerate(batches):
+                    submission = BatchSubmission(index)
+                    submissions.append(submission)
+                    window.acquire()
+                    try:
+                        payment_data = serialize_many(payments)
+                        signature_future = None
+                        if sign_pool is not None:
+                            signature_future = sign_pool.submit(sign_in_process, payment_data.encode('utf-8'))
+                    except Exception as exc:
+                        submission.error = exc
+                        window.release()
+                        continue
+                    futures.append(send_pool.submit(
+                        self._submit_batch, submission, payment_data, accounts, signature_future, window))
+                for future in futures:
+                    future.result()
+        finally:
+            if sign_pool is not None:
+                sign_pool.shutdown()
+        return submissions
+
+    def get_document_fee(
+            self, document_type: str, source_account: str, amount: Decimal, dest_account: str = None,
+            wiretag: str = None):
+        data = self._document_fee_data(document_type, source_account, amount, dest_account, wiretag)
+        if self.read_cache is None:
+            return self.secure_request('get_document_fee', data)
+        key = ('get_document_fee', document_type, source_account, amount, dest_account, wiretag)
+        return copy.deepcopy(self._cached_read(key, self.secure_request, 'get_document_fee', data))
+
+    def get_batch_info(self, batch_id, page_size=1, start_offset=0):
+        return self.secure_request('get_batch_info', self._batch_info_data(batch_id, page_size, start_offset))
+
+    def iter_batch_records(
+            self, batch_id, page_size=BATCH_INFO_PAGE_SIZE, prefetch=BATCH_INFO_PREFETCH, start_offset=0):
+        """
+        Yield :class:`capitalist.models.BatchRecordInfo` for every record of a batch.
+
+        Pages are requested as :class:`capitalist.utils.BatchPages` plans them: the first one alone, then up
+        to ``prefetch`` pages concurrently ahead of the one being consumed while pages come back full.
+        """
+        pages = BatchPages(page_size, prefetch, start_offset)
+        pending = deque()  # (offset, future) of the pages requested ahead
+        with ThreadPoolExecutor(pages.prefetch) as pool:
+            try:
+                while True:
+                    for offset in pages.to_request(len(pending)):
+                        pending.append(
+                            (offset, pool.submit(self.get_batch_info, batch_id, pages.page_size, offset)))
+                    if not pending:
+                        break
+                    offset, future = pending.popleft()
+                    records = self._parse_batch_records(future.result())
+                    pages.received(offset, len(records))
+                    if pages.done:
+                        for _, future in pending:
+                            future.cancel()
+                        pending.clear()
+                    yield from records
+            finally:
+                for _, future in pending:
+                    future.cancel()
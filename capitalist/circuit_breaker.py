@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import deque
+
+from .const import (
+    BREAKER_FAILURE_RATE, BREAKER_WINDOW, BREAKER_MIN_CALLS, BREAKER_RECOVERY_TIMEOUT, BREAKER_HALF_OPEN_CALLS,
+)
+from .exceptions import CircuitOpenError
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker for ``RequestExecutor``.
+
+    The outcomes of the last ``window`` calls are kept. When at least ``min_calls`` of them are known and the
+    share of failures reaches ``failure_rate``, the breaker opens and calls fail fast with ``CircuitOpenError``.
+    After ``recovery_timeout`` seconds it becomes half-open and lets ``half_open_calls`` probe calls through:
+    a successful probe closes it again, a failed one reopens it. A probe that ends without an outcome (e.g. its
+    task was cancelled) gives its slot back with :meth:`release`; slots of probes that never report are
+    handed out again after another ``recovery_timeout``.
+
+    One instance guards every operation. Use :class:`PerOperationCircuitBreaker` to trip operations separately.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(
+            self,
+            failure_rate=BREAKER_FAILURE_RATE,
+            window=BREAKER_WINDOW,
+            min_calls=BREAKER_MIN_CALLS,
+            recovery_timeout=BREAKER_RECOVERY_TIMEOUT,
+            half_open_calls=BREAKER_HALF_OPEN_CALLS,
+            operation=None,
+    ):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.recovery_timeout = recovery_timeout
+        self.half_open_calls = half_open_calls
+        self.operation = operation
+        self._outcomes = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = None
+        self._probes = 0
+        self._probe_started_at = None
+        self._lock = threading.Lock()
+
+    def for_operation(self, operation):
+        return self
+
+    def _current_state(self):
+        now = time.monotonic()
+        if self._state == self.OPEN and now - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._probes = 0
+        elif (
+            self._state == self.HALF_OPEN and self._probes >= self.half_open_calls
+            and now - self._probe_started_at >= self.recovery_timeout
+        ):
+            # The probes got lost without reporting: let new ones through instead of staying stuck.
+            self._probes = 0
+        return self._state
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+
+    def before_call(self):
+        """Raise ``CircuitOpenError`` if the call must not be sent."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                self._probe_started_at = time.monotonic()
+                return
+            if state == self.HALF_OPEN:
+                started = self._probe_started_at
+            else:
+                started = self._opened_at
+            retry_after = max(self.recovery_timeout - (time.monotonic() - started), 0)
+        raise CircuitOpenError(self.operation, retry_after)
+
+    def record_success(self):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._state = self.CLOSED
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._open()
+                return
+            self._outcomes.append(False)
+            calls = len(self._outcomes)
+            if self._state == self.CLOSED and calls >= self.min_calls:
+                if self._outcomes.count(False) / calls >= self.failure_rate:
+                    self._open()
+
+    def release(self):
+        """A call let through by :meth:`before_call` ended without an outcome: free its probe slot."""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def reset(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._outcomes.clear()
+
+    def health(self):
+        """``{operation: state}`` for health checks; ``None`` stands for all operations."""
+        return {self.operation: self.state}
+
+
+class PerOperationCircuitBreaker:
+    """Separate :class:`CircuitBreaker` per API operation, created on first use with the given settings."""
+
+    def __init__(self, **breaker_kwargs):
+        self.breaker_kwargs = breaker_kwargs
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def for_operation(self, operation):
+        breaker = self._breakers.get(operation)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(
+                    operation, CircuitBreaker(operation=operation, **self.breaker_kwargs))
+        return breaker
+
+    def reset(self):
+        for breaker in list(self._breakers.values()):
+            breaker.reset()
+
+    def health(self):
+        return {operation: breaker.state for operation, breaker in list(self._breakers.items())}
@@ -2,3 +2,52 @@ __version__ = '1.0.0'
 
 TIMEOUT = 15
 API_URL = 'https://api.capitalist.net'
+CONNECTION_LIMIT = 100
+# Connection pool of RequestExecutor: number of hosts pooled and connections kept per host.
+POOL_CONNECTIONS = 1
+POOL_MAXSIZE = 32
+
+# Default bounds of a single batch submitted by iter_import_batch_chunked.
+BATCH_MAX_RECORDS = 5000
+BATCH_MAX_BYTES = 1024 * 1024
+# Decimal places of monetary amounts parsed from responses, per currency.
+DEFAULT_DECIMAL_PLACES = 2
+CURRENCY_DECIMAL_PLACES = {
+    'BTC': 8,
+}
+# Default page size and number of pages fetched ahead by iter_batch_records.
+BATCH_INFO_PAGE_SIZE = 1000
+BATCH_INFO_PREFETCH = 4
+# Seconds currency rates fetched by RateTable are reused before asking the API again.
+RATES_TTL = 60
+# Default RetryPolicy: attempts per call, full-jitter backoff bounds and total budget in seconds.
+RETRY_TRIES = 4
+RETRY_BASE_DELAY = 1
+RETRY_MAX_DELAY = 10
+RETRY_DEADLINE = 30
+# Response codes worth retrying. Transport errors (RequestException) are retried too, except for operations below.
+RETRYABLE_CODES = ()
+# Operations that must not run twice: a transport error is retried only if the request never reached the server.
+NON_IDEMPOTENT_OPERATIONS = ('import_batch_advanced',)
+# Default CircuitBreaker settings: failure share over the last calls that opens it and seconds before a probe.
+BREAKER_FAILURE_RATE = 0.5
+BREAKER_WINDOW = 20
+BREAKER_MIN_CALLS = 10
+BREAKER_RECOVERY_TIMEOUT = 30
+BREAKER_HALF_OPEN_CALLS = 1
+# Default number of batches import_batches keeps in flight.
+BULK_MAX_WORKERS = 8
+
+# Seconds a token obtained with get_token is trusted, and how long before that a new one is fetched in the background.
+TOKEN_TTL = 15 * 60
+TOKEN_REFRESH_MARGIN = 60
+# Response codes meaning the token was rejected; see Authenticator(token_error_codes=..., match_token_messages=...).
+TOKEN_ERROR_CODES = ()
+# Leading letters of Capitalist account numbers: RUB, USD, EUR, USD tether and BTC accounts.
+CAPITALIST_ACCOUNT_TYPES = ('R', 'U', 'E', 'T', 'B')
+# Payment currencies accepted by BatchValidator: the currencies of the accounts import_batch_advanced debits.
+BATCH_CURRENCIES = ('RUR', 'USD', 'EUR', 'BTC')
+# Card kinds returned by guess_card_type, i.e. which payment class serves a card.
+CARD_WORLDWIDE = 0
+CARD_RU = 1
+CARD_UA = 2
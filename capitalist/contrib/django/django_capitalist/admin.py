@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Account, Currency
+from .models import Account, Currency, Rate
 
 
 @admin.register(Account)
@@ -11,3 +11,8 @@ class AccountAdmin(admin.ModelAdmin):
 @admin.register(Currency)
 class CurrencyAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(Rate)
+class RateAdmin(admin.ModelAdmin):
+    pass
@@ -1,5 +1,9 @@
+import time
+from decimal import Decimal
+
 from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import transaction
 
 from capitalist import Capitalist
 from ...models import Account, Currency
@@ -7,15 +11,51 @@ from ...models import Account, Currency
 
 class Command(BaseCommand):
     def handle(self, *args, **options):
+        started = time.monotonic()
         cap = Capitalist(settings.CAPITALIST_LOGIN, settings.CAPITALIST_PASSWORD)
+        remote_accounts = cap.accounts()
+        fetched = time.monotonic()
+
+        with transaction.atomic():
+            currencies = {currency.code: currency for currency in Currency.objects.all()}
+            new_codes = {acc.currency for acc in remote_accounts} - currencies.keys()
+            if new_codes:
+                Currency.objects.bulk_create([Currency(code=code) for code in new_codes], ignore_conflicts=True)
+                currencies = {currency.code: currency for currency in Currency.objects.all()}
+
+            existing = {account.number: account for account in Account.objects.all()}
+            changed = []
+            for acc in remote_accounts:
+                account = Account(
+                    number=acc.number,
+                    name=acc.name,
+                    balance=self._to_decimal('balance', acc.balance),
+                    blocked_amount=self._to_decimal('blocked_amount', acc.blocked_amount),
+                    currency=currencies[acc.currency],
+                )
+                if not self._is_same(existing.get(acc.number), account):
+                    changed.append(account)
+            if changed:
+                Account.objects.bulk_create(
+                    changed, update_conflicts=True, unique_fields=['number'],
+                    update_fields=['name', 'balance', 'blocked_amount', 'currency'])
+
+        self.stdout.write(self.style.SUCCESS(
+            'Accounts updated successfully: {} fetched, {} written, {} new currencies '
+            '(API {:.2f}s, DB {:.2f}s)'.format(
+                len(remote_accounts), len(changed), len(new_codes), fetched - started, time.monotonic() - fetched)))
 
-        for acc in cap.accounts():
-            Account.objects.update_or_create(number=acc.number, defaults={
-                'balance': acc.balance,
-                'blocked_amount': acc.blocked_amount,
-                'currency': Currency.objects.get_or_create(code=acc.currency)[0],
-                'name': acc.name,
-                'number': acc.number,
-            })
+    @staticmethod
+    def _to_decimal(field_name, value):
+        # Match what the database stores so unchanged accounts compare equal.
+        field = Account._meta.get_field(field_name)
+        return field.to_python(value).quantize(Decimal(1).scaleb(-field.decimal_places))
 
-        self.stdout.write(self.style.SUCCESS('Accounts updated successfully'))
+    @staticmethod
+    def _is_same(current, account):
+        return current is not None and (
+            current.name == account.name
+            and current.balance == account.balance
+            and current.blocked_amount == account.blocked_amount
+            and current.currency_id == account.currency_id
+        )
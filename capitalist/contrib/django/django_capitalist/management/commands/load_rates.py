@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from capitalist import Capitalist
+from ...models import Currency, Rate
+
+
+class Command(BaseCommand):
+    help = 'Store a snapshot of Capitalist currency rates.'
+
+    def handle(self, *args, **options):
+        cap = Capitalist(settings.CAPITALIST_LOGIN, settings.CAPITALIST_PASSWORD)
+        rates = cap.currency_rates()
+        fetched_at = timezone.now()
+
+        with transaction.atomic():
+            codes = {rate.amount_currency for rate in rates} | {rate.target_currency for rate in rates}
+            Currency.objects.bulk_create([Currency(code=code) for code in codes], ignore_conflicts=True)
+            currencies = dict(Currency.objects.filter(code__in=codes).values_list('code', 'pk'))
+
+            Rate.objects.bulk_create([
+                Rate(
+                    source_id=currencies[rate.amount_currency],
+                    target_id=currencies[rate.target_currency],
+                    type=rate.type,
+                    rate=rate.amount,
+                    fetched_at=fetched_at,
+                )
+                for rate in rates
+            ])
+
+        self.stdout.write(self.style.SUCCESS('Rates saved: {}'.format(len(rates))))
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from capitalist import Capitalist
+from ...services import BatchSynchronizer
+
+
+class Command(BaseCommand):
+    help = 'Update states of batch records from Capitalist for batches that are still being processed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Poll every open batch ignoring poll intervals.')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Records per UPDATE query.')
+
+    def handle(self, *args, **options):
+        cap = Capitalist(settings.CAPITALIST_LOGIN, settings.CAPITALIST_PASSWORD)
+        synchronizer = BatchSynchronizer(cap, chunk_size=options['chunk_size'])
+
+        batches, records = synchronizer.sync(force=options['force'])
+
+        self.stdout.write(self.style.SUCCESS(
+            'Batches checked: {}, records updated: {}'.format(batches, records)))
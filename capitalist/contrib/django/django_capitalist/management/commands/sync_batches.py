@@ -0,0 +1,55 @@
+import asyncio
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ...services import AsyncBatchSynchronizer
+
+
+class Command(BaseCommand):
+    help = (
+        'Keep updating states of batch records from Capitalist, polling many open batches concurrently. '
+        'Stops after the current tick on SIGINT or SIGTERM.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=30, help='Seconds between ticks.')
+        parser.add_argument('--concurrency', type=int, default=20, help='Batches polled at the same time.')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Records per UPDATE query.')
+        parser.add_argument('--force', action='store_true', help='Poll every open batch ignoring poll intervals.')
+        parser.add_argument('--once', action='store_true', help='Run a single tick and exit.')
+
+    def handle(self, *args, **options):
+        try:
+            from capitalist.aio import AsyncCapitalist
+        except ImportError:
+            raise CommandError('sync_batches needs aiohttp: pip install django4-capitalist[aio]')
+        asyncio.run(self.run(AsyncCapitalist, options))
+
+    async def run(self, capitalist_class, options):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # no signal handlers outside of the main thread or on Windows
+
+        async with capitalist_class(settings.CAPITALIST_LOGIN, settings.CAPITALIST_PASSWORD) as cap:
+            synchronizer = AsyncBatchSynchronizer(
+                cap, concurrency=options['concurrency'], chunk_size=options['chunk_size'])
+            while not stop.is_set():
+                started = time.monotonic()
+                batches, records = await synchronizer.sync(force=options['force'])
+                self.stdout.write('Batches checked: {}, records updated: {} ({:.2f}s)'.format(
+                    batches, records, time.monotonic() - started))
+                if options['once']:
+                    break
+                try:
+                    await asyncio.wait_for(stop.wait(), max(options['interval'] - (time.monotonic() - started), 0))
+                except asyncio.TimeoutError:
+                    pass
+
+        self.stdout.write(self.style.SUCCESS('Stopped.'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_capitalist', '0002_auto_20190328_1508'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='batch',
+            name='checked_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='checked at'),
+        ),
+    ]
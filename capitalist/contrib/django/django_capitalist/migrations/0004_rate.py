@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_capitalist', '0003_batch_checked_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Rate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('buy', 'Buy'), ('sell', 'Sell'), ('uahSell', 'Sell for UAH')], max_length=10, verbose_name='type')),
+                ('rate', models.DecimalField(decimal_places=8, max_digits=20, verbose_name='rate')),
+                ('fetched_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='fetched at')),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='source_rates', to='django_capitalist.currency', verbose_name='source currency')),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='target_rates', to='django_capitalist.currency', verbose_name='target currency')),
+            ],
+            options={
+                'verbose_name': 'rate',
+                'verbose_name_plural': 'rates',
+                'indexes': [models.Index(fields=['source', 'target', 'type', '-fetched_at'], name='capitalist_rate_pair_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('django_capitalist', '0004_rate'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='batchrecord',
+            index=models.Index(fields=['batch', 'state'], name='capitalist_record_batch_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='batchrecord',
+            index=models.Index(fields=['state', 'updated_at'], name='capitalist_record_state_idx'),
+        ),
+    ]
@@ -1,3 +1,5 @@
+from collections import defaultdict
+
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
@@ -16,10 +18,49 @@ class Currency(models.Model):
         return self.code
 
 
-# TODO
-# class Rate(models.Model):
-#     source = models.ForeignKey(Currency, models.CASCADE, verbose_name=_('source currency'), related_name='source_rates')
-#     target = models.ForeignKey(Currency, models.CASCADE, verbose_name=_('target currency'), related_name='target_rates')
+class RateQuerySet(models.QuerySet):
+    def latest_snapshot(self):
+        """Rates of the most recent snapshot, fetched together with their currencies."""
+        latest = self.model.objects.order_by('-fetched_at').values('fetched_at')[:1]
+        return self.filter(fetched_at=models.Subquery(latest)).select_related('source', 'target')
+
+    def latest_matrix(self):
+        """``{(type, source code, target code): rate}`` of the most recent snapshot, in one query."""
+        return {(rate.type, rate.source.code, rate.target.code): rate.rate for rate in self.latest_snapshot()}
+
+
+class Rate(models.Model):
+    """
+    Append-only snapshot of ``currency_rates()``: one unit of ``target`` costs ``rate`` of ``source``.
+    All rows written by one fetch share the same ``fetched_at``.
+    """
+    BUY = 'buy'
+    SELL = 'sell'
+    UAH_SELL = 'uahSell'
+
+    TYPE_CHOICES = (
+        (BUY, _('Buy')),
+        (SELL, _('Sell')),
+        (UAH_SELL, _('Sell for UAH')),
+    )
+
+    source = models.ForeignKey(Currency, models.CASCADE, verbose_name=_('source currency'), related_name='source_rates')
+    target = models.ForeignKey(Currency, models.CASCADE, verbose_name=_('target currency'), related_name='target_rates')
+    type = models.CharField(_('type'), max_length=10, choices=TYPE_CHOICES)
+    rate = models.DecimalField(_('rate'), max_digits=20, decimal_places=8)
+    fetched_at = models.DateTimeField(_('fetched at'), default=timezone.now, db_index=True)
+
+    objects = RateQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _('rate')
+        verbose_name_plural = _('rates')
+        indexes = [
+            models.Index(fields=['source', 'target', 'type', '-fetched_at'], name='capitalist_rate_pair_idx'),
+        ]
+
+    def __str__(self):
+        return '{} {}/{}: {}'.format(self.type, self.source, self.target, self.rate)
 
 
 class Account(models.Model):
@@ -41,6 +82,7 @@ class Batch(models.Model):
     batch_id = models.CharField(_('batch ID'), max_length=50, unique=True)
     created_at = models.DateTimeField(_('created at'), default=timezone.now)
     updated_at = models.DateTimeField(_('updated at'), auto_now=True)
+    checked_at = models.DateTimeField(_('checked at'), blank=True, null=True)
 
     # Not required. Just for your convenience.
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, blank=True, null=True)
@@ -55,6 +97,69 @@ class Batch(models.Model):
         return 'Batch {}'.format(self.batch_id)
 
 
+class BatchRecordQuerySet(models.QuerySet):
+    """
+    State queries and bulk state transitions of batch records. Filters are written as ``state IN (...)``
+    so they can use the ``(batch, state)`` and ``(state, updated_at)`` indexes, and every transition is a
+    single ``UPDATE`` guarded by the states it may start from, so terminal records are never touched.
+    """
+
+    def in_states(self, *states):
+        return self.filter(state__in=states)
+
+    def pending(self):
+        """Records still being processed by Capitalist."""
+        return self.filter(state__in=self.model.OPEN_STATES)
+
+    def finished(self):
+        return self.filter(state__in=self.model.TERMINAL_STATES)
+
+    def state_counts(self):
+        """``{state: number of records}`` in one aggregate query."""
+        return dict(self.order_by().values_list('state').annotate(count=models.Count('pk')))
+
+    def transition(self, state, from_states=None, now=None):
+        """
+        Move records in ``from_states`` (by default every open state but ``state``) to ``state`` with one
+        ``UPDATE``. Returns the number of updated records.
+        """
+        if from_states is None:
+            from_states = [open_state for open_state in self.model.OPEN_STATES if open_state != state]
+        # update() does not go through save(), so auto_now has to be applied by hand.
+        return self.filter(state__in=from_states).update(state=state, updated_at=now or timezone.now())
+
+    def mark_ready(self, now=None):
+        return self.transition(self.model.READY, from_states=[self.model.NEW], now=now)
+
+    def mark_in_process(self, now=None):
+        return self.transition(self.model.INPROCESS, from_states=[self.model.NEW, self.model.READY], now=now)
+
+    def mark_processed(self, now=None):
+        return self.transition(self.model.PROCESSED, now=now)
+
+    def mark_declined(self, now=None):
+        return self.transition(self.model.DECLINED, now=now)
+
+    def apply_states(self, states, now=None, chunk_size=500):
+        """
+        Store remote ``states`` (``internal_id`` -> state) on the open records among these. Records are
+        grouped by their new state, so this takes one ``UPDATE`` per state and ``chunk_size`` records instead
+        of one per record. Unknown states are ignored. Returns the number of updated records.
+        """
+        valid_states = dict(self.model.STATE_CHOICES)
+        by_state = defaultdict(list)
+        for internal_id, state in states.items():
+            if state in valid_states:
+                by_state[state].append(internal_id)
+        now = now or timezone.now()
+        updated = 0
+        for state, internal_ids in by_state.items():
+            for start in range(0, len(internal_ids), chunk_size):
+                records = self.filter(internal_id__in=internal_ids[start:start + chunk_size])
+                updated += records.transition(state, now=now)
+        return updated
+
+
 class BatchRecord(models.Model):
     NEW = 'NEW'
     READY = 'READY'
@@ -69,6 +174,8 @@ class BatchRecord(models.Model):
         (DECLINED, _('Declined')),
         (PROCESSED, _('Processed')),
     )
+    OPEN_STATES = (NEW, READY, INPROCESS)
+    TERMINAL_STATES = (DECLINED, PROCESSED)
 
     batch = models.ForeignKey(Batch, models.CASCADE, verbose_name=_('batch'))
     state = models.CharField(_('status'), max_length=20, choices=STATE_CHOICES, default=NEW)
@@ -82,9 +189,15 @@ class BatchRecord(models.Model):
     object_id = models.PositiveIntegerField(blank=True, null=True)
     related_object = GenericForeignKey('content_type', 'object_id')
 
+    objects = BatchRecordQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('batch record')
         verbose_name_plural = _('batch records')
         unique_together = [
             ['batch', 'internal_id'],
         ]
+        indexes = [
+            models.Index(fields=['batch', 'state'], name='capitalist_record_batch_idx'),
+            models.Index(fields=['state', 'updated_at'], name='capitalist_record_state_idx'),
+        ]
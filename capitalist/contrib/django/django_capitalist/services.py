@@ -0,0 +1,291 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Batch, BatchRecord
+
+logger = logging.getLogger(__name__)
+
+
+class BalanceProvider:
+    """
+    Serve ``accounts()`` from Django's cache framework with stale-while-revalidate.
+
+    A snapshot younger than ``fresh_for`` seconds is returned as is. An older one is still returned, and a
+    refresh runs in a background thread; at most one refresh runs at a time across all processes sharing the
+    cache. Snapshots are dropped from the cache ``stale_for`` seconds after they go stale. Only the very first
+    read, with nothing cached yet, waits for the API, unless ``block_on_miss`` is off: then it returns
+    ``None`` while the snapshot is being fetched.
+
+    Call :meth:`invalidate` after balances changed, e.g. after a batch import (see :class:`BatchRecorder`):
+    readers keep getting the old snapshot until the new one is in.
+    """
+
+    def __init__(
+            self, capitalist, cache_alias='default', key='capitalist:accounts', fresh_for=60, stale_for=60 * 60,
+            block_on_miss=True):
+        self.capitalist = capitalist
+        self.cache_alias = cache_alias
+        self.key = key
+        self.fresh_for = fresh_for
+        self.stale_for = stale_for
+        self.block_on_miss = block_on_miss
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    @property
+    def invalidated_key(self):
+        return self.key + ':invalidated'
+
+    def _store(self, fetched_at, accounts):
+        """Cache ``accounts`` fetched from ``fetched_at`` on, unless :meth:`invalidate` was called since."""
+        invalidated_at = self.cache.get(self.invalidated_key)
+        if invalidated_at is not None and fetched_at < invalidated_at:
+            return False
+        self.cache.set(self.key, (fetched_at, accounts), self.fresh_for + self.stale_for)
+        return True
+
+    def refresh(self):
+        """Fetch accounts from the API now and cache them."""
+        started = time.time()
+        accounts = self.capitalist.accounts()
+        self._store(started, accounts)
+        return accounts
+
+    def _refresh_locked(self, lock_key):
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception('Could not refresh Capitalist balances')
+        finally:
+            self.cache.delete(lock_key)
+
+    def refresh_in_background(self):
+        """Start a refresh in a daemon thread unless one is already running. Returns whether it started."""
+        lock_key = self.key + ':refreshing'
+        # The lock expires by itself in case the refreshing process dies.
+        if not self.cache.add(lock_key, True, max(self.fresh_for, 30)):
+            return False
+        threading.Thread(target=self._refresh_locked, args=(lock_key,), daemon=True).start()
+        return True
+
+    def accounts(self):
+        """Cached list of :class:`capitalist.models.Account`, refreshed in the background once stale."""
+        entry = self.cache.get(self.key)
+        if entry is None:
+            if self.block_on_miss:
+                return self.refresh()
+            self.refresh_in_background()
+            return None
+        fetched_at, accounts = entry
+        if time.time() - fetched_at >= self.fresh_for:
+            self.refresh_in_background()
+        return accounts
+
+    def balances(self):
+        """``{account number: Account}`` of the cached snapshot."""
+        return {account.number: account for account in self.accounts() or ()}
+
+    def invalidate(self):
+        """
+        Mark the cached snapshot stale and start refreshing it. A refresh already running when this is called
+        does not store its result, which may predate the change; the next read starts another one.
+        """
+        self.cache.set(self.invalidated_key, time.time(), self.fresh_for + self.stale_for)
+        entry = self.cache.get(self.key)
+        if entry is not None:
+            self.cache.set(self.key, (0, entry[1]), self.fresh_for + self.stale_for)
+        self.refresh_in_background()
+
+
+class BatchRecorder:
+    """
+    Submit payments with ``import_batch_advanced`` and store the accepted batch as a ``Batch`` with a
+    ``BatchRecord`` per payment, its ``as_batch_record()`` output kept in ``data``.
+
+    Records are inserted with ``bulk_create`` in chunks of ``chunk_size`` inside one transaction, so a batch
+    of any size costs a couple of queries per chunk and is stored completely or not at all. With a
+    ``validator`` (:class:`capitalist.validation.BatchValidator`) payments are checked before submission,
+    a ``balance_provider`` (:class:`BalanceProvider`) is invalidated after every submission.
+    """
+
+    def __init__(self, capitalist, chunk_size=5000, validator=None, balance_provider=None):
+        self.capitalist = capitalist
+        self.chunk_size = chunk_size
+        self.validator = validator
+        self.balance_provider = balance_provider
+
+    @staticmethod
+    def records(payments):
+        """``(internal_id, batch record)`` of every payment of an iterable or a ``PaymentBatch``."""
+        columns = getattr(payments, 'columns', None)
+        if columns is not None:
+            return zip(columns['internal_id'], payments.iter_records())
+        return ((payment.internal_id, payment.as_batch_record()) for payment in payments)
+
+    def submit(self, payments, account_rur, account_usd, account_eur, account_btc, related_object=None):
+        """Submit ``payments`` and return the stored ``Batch``; ``related_object`` is linked to it."""
+        if not hasattr(payments, 'iter_records'):
+            payments = list(payments)
+        if self.validator is not None:
+            self.validator.validate(payments).raise_for_errors()
+        try:
+            response = self.capitalist.import_batch_advanced(
+                payments, account_rur, account_usd, account_eur, account_btc)
+        finally:
+            if self.balance_provider is not None:
+                self.balance_provider.invalidate()
+        batch_id = self.capitalist._batch_id(response)
+        try:
+            return self.save(batch_id, payments, related_object)
+        except Exception:
+            logger.exception('Batch %s was accepted by Capitalist but could not be saved', batch_id)
+            raise
+
+    @transaction.atomic
+    def save(self, batch_id, payments, related_object=None):
+        """Store an already submitted batch and its records."""
+        now = timezone.now()
+        batch = Batch(batch_id=batch_id, created_at=now)
+        if related_object is not None:
+            batch.content_type = ContentType.objects.get_for_model(related_object)
+            batch.object_id = related_object.pk
+        batch.save()
+        BatchRecord.objects.bulk_create(
+            (
+                BatchRecord(batch=batch, internal_id=internal_id, data=record, created_at=now, updated_at=now)
+                for internal_id, record in self.records(payments)
+            ),
+            batch_size=self.chunk_size,
+        )
+        return batch
+
+
+class BatchSynchronizer:
+    """
+    Pull record states of open batches from ``get_batch_info`` and store changes on ``BatchRecord``.
+
+    A batch is open while it has at least one record in a non-terminal state. Open batches are polled
+    with an interval growing with their age: ``interval_factor`` of the age, bounded by ``min_interval``
+    and ``max_interval``. So a batch created a minute ago is checked almost every tick while one that
+    has been processing for days is checked a few times per day. A batch that fails to sync is logged and
+    left unchecked, so it is retried on the next pass without holding up the others.
+    """
+
+    def __init__(
+            self,
+            capitalist,
+            chunk_size=500,
+            min_interval=timedelta(minutes=1),
+            max_interval=timedelta(hours=6),
+            interval_factor=0.1,
+    ):
+        self.capitalist = capitalist
+        self.chunk_size = chunk_size
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval_factor = interval_factor
+
+    def poll_interval(self, batch, now):
+        interval = (now - batch.created_at) * self.interval_factor
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def is_due(self, batch, now):
+        return batch.checked_at is None or batch.checked_at + self.poll_interval(batch, now) <= now
+
+    def open_batches(self):
+        open_ids = BatchRecord.objects.pending().values('batch_id')
+        return Batch.objects.filter(pk__in=open_ids).order_by('created_at')
+
+    def due_batches(self, now=None):
+        now = now or timezone.now()
+        return [batch for batch in self.open_batches() if self.is_due(batch, now)]
+
+    def fetch_states(self, batch):
+        return {record.internal_id: record.state for record in self.capitalist.iter_batch_records(batch.batch_id)}
+
+    @transaction.atomic
+    def apply(self, batch, states, now=None):
+        now = now or timezone.now()
+        updated = BatchRecord.objects.filter(batch=batch).apply_states(states, now, self.chunk_size)
+        Batch.objects.filter(pk=batch.pk).update(checked_at=now)
+        batch.checked_at = now
+        return updated
+
+    @transaction.atomic
+    def apply_many(self, results, now=None):
+        """Store the states of several batches, ``[(batch, states)]``, in one transaction."""
+        now = now or timezone.now()
+        updated = 0
+        for batch, states in results:
+            updated += BatchRecord.objects.filter(batch=batch).apply_states(states, now, self.chunk_size)
+        Batch.objects.filter(pk__in=[batch.pk for batch, _ in results]).update(checked_at=now)
+        for batch, _ in results:
+            batch.checked_at = now
+        return updated
+
+    def sync_batch(self, batch):
+        return self.apply(batch, self.fetch_states(batch))
+
+    def sync(self, force=False):
+        """Synchronize every due open batch (every open batch with ``force``). Returns ``(batches, records)``."""
+        batches = list(self.open_batches()) if force else self.due_batches()
+        synced = updated = 0
+        for batch in batches:
+            try:
+                updated += self.sync_batch(batch)
+            except Exception:
+                logger.exception('Could not sync states of batch %s', batch.batch_id)
+            else:
+                synced += 1
+        return synced, updated
+
+
+class AsyncBatchSynchronizer(BatchSynchronizer):
+    """
+    :class:`BatchSynchronizer` polling with :class:`capitalist.aio.AsyncCapitalist`: the record states of up
+    to ``concurrency`` batches are fetched at once and all results of a tick are written in one transaction.
+    A batch whose fetch failed is left unchecked and polled again on the next tick.
+    """
+
+    def __init__(self, capitalist, concurrency=20, **kwargs):
+        super().__init__(capitalist, **kwargs)
+        self.concurrency = concurrency
+
+    async def fetch_states(self, batch):
+        return {record.internal_id: record.state async for record in self.capitalist.iter_batch_records(batch.batch_id)}
+
+    async def _fetch(self, semaphore, batch):
+        async with semaphore:
+            try:
+                return batch, await self.fetch_states(batch)
+            except Exception:
+                logger.exception('Could not fetch states of batch %s', batch.batch_id)
+                return batch, None
+
+    async def sync_batch(self, batch):
+        states = await self.fetch_states(batch)
+        return await sync_to_async(self.apply)(batch, states)
+
+    def _due_batches(self, force):
+        close_old_connections()
+        return list(self.open_batches()) if force else self.due_batches()
+
+    async def sync(self, force=False):
+        """Run one tick: poll every due open batch (every open batch with ``force``). Returns ``(batches, records)``."""
+        batches = await sync_to_async(self._due_batches)(force)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self._fetch(semaphore, batch) for batch in batches))
+        results = [(batch, states) for batch, states in results if states is not None]
+        updated = await sync_to_async(self.apply_many)(results) if results else 0
+        return len(results), updated
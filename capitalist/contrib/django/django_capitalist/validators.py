@@ -2,26 +2,23 @@ from django.core.exceptions import ValidationError
 from django.utils.deconstruct import deconstructible
 from django.utils.translation import gettext_lazy as _
 
+from capitalist.const import CAPITALIST_ACCOUNT_TYPES
+from capitalist.validation import is_capitalist_account
+
 
 @deconstructible
 class CapitalistAccountValidator:
     message = _('Invalid Capitalist account number.')
     code = 'invalid_capitalist_account'
-    account_types = (
-        'R',  # rub
-        'U',  # usd
-        'E',  # eur
-        'T',  # usd tether
-        'B',  # btc
-    )
+    account_types = CAPITALIST_ACCOUNT_TYPES
 
     def __init__(self, account_types=None):
-        self.account_types = account_types
+        if account_types is not None:
+            self.account_types = account_types
 
     def __call__(self, value):
-        if len(value) < 2 or value[0] not in self.account_types:
-            raise ValidationError(self.message, code=self.code)
-        try:
-            int(value[1:])
-        except ValueError:
+        if not is_capitalist_account(value, self.account_types):
             raise ValidationError(self.message, code=self.code)
+
+    def __eq__(self, other):
+        return isinstance(other, CapitalistAccountValidator) and self.account_types == other.account_types
@@ -12,13 +12,15 @@ class ImproperlyConfigured(CapitalistException):
 class RequestException(CapitalistException):
     """Indicate that there was an error with the incomplete HTTP request."""
 
-    def __init__(self, original_exception, request_kwargs):
+    def __init__(self, original_exception, request_kwargs, request_sent=True):
         """Initialize a RequestException instance.
         :param original_exception: The original exception that occurred.
         :param request_kwargs: The keyword arguments to the request function.
+        :param request_sent: False when the request certainly never reached the server (the connection failed).
         """
         self.original_exception = original_exception
         self.request_kwargs = request_kwargs
+        self.request_sent = request_sent
         super(RequestException, self).__init__(
             "error with request {}".format(original_exception)
         )
@@ -37,3 +39,43 @@ class ResponseException(CapitalistException):
         super(ResponseException, self).__init__(
             "received error with code {}".format(self.code)
         )
+
+
+class RateNotFound(CapitalistException):
+    """Capitalist does not publish a rate for the requested currency pair."""
+
+    def __init__(self, type_, from_currency, to_currency):
+        self.type = type_
+        self.from_currency = from_currency
+        self.to_currency = to_currency
+        super(RateNotFound, self).__init__(
+            "no {} rate for {} -> {}".format(type_, from_currency, to_currency)
+        )
+
+
+class CircuitOpenError(CapitalistException):
+    """The circuit breaker is open: the call was not sent to let the API recover."""
+
+    def __init__(self, operation=None, retry_after=None):
+        """Initialize a CircuitOpenError instance.
+        :param operation: Operation of the rejected call.
+        :param retry_after: Seconds until the breaker lets a probe call through.
+        """
+        self.operation = operation
+        self.retry_after = retry_after
+        super(CircuitOpenError, self).__init__(
+            "circuit open for {}, retry after {:.1f}s".format(operation or 'all operations', retry_after or 0)
+        )
+
+
+class BatchValidationError(CapitalistException):
+    """Payments of a batch failed local validation, see :class:`capitalist.validation.BatchValidator`."""
+
+    def __init__(self, result):
+        """Initialize a BatchValidationError instance.
+        :param result: The ValidationResult holding the errors by internal ID.
+        """
+        self.result = result
+        super(BatchValidationError, self).__init__(
+            "{} of {} payments are invalid".format(len(result.errors), result.checked)
+        )
@@ -0,0 +1,120 @@
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+
+class Metrics:
+    """
+    Instrumentation hooks called by the client. This base class does nothing and has ``enabled = False``,
+    which makes the callers skip timing and size measurements altogether.
+
+    Subclass it and set ``enabled = True`` to collect data, or use :class:`PrometheusMetrics`.
+    """
+    enabled = False
+
+    def observe_request(self, operation, seconds, request_bytes, response_bytes):
+        """An HTTP round-trip of ``operation`` completed."""
+
+    def record_error(self, operation, code):
+        """``operation`` failed: ``code`` is the API error code or the name of the transport error."""
+
+    def record_retry(self, operation):
+        """``operation`` is attempted again by the retry policy."""
+
+    def record_token_refresh(self):
+        """A new token was obtained with ``get_token``."""
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(**labels):
+    pairs = ('{}="{}"'.format(name, str(value).replace('"', '\\"')) for name, value in labels.items())
+    return '{' + ','.join(pairs) + '}'
+
+
+class PrometheusMetrics(Metrics):
+    """
+    Collects per-operation latency and payload size histograms and retry, error and token refresh counters
+    in memory. :meth:`render` returns them in the Prometheus text exposition format, ready to be served
+    from a ``/metrics`` endpoint.
+    """
+    enabled = True
+
+    LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30)
+    SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+    def __init__(self, prefix='capitalist', latency_buckets=LATENCY_BUCKETS, size_buckets=SIZE_BUCKETS):
+        self.prefix = prefix
+        self._latency = defaultdict(lambda: _Histogram(latency_buckets))
+        self._request_size = defaultdict(lambda: _Histogram(size_buckets))
+        self._response_size = defaultdict(lambda: _Histogram(size_buckets))
+        self._retries = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._token_refreshes = 0
+        self._lock = threading.Lock()
+
+    def observe_request(self, operation, seconds, request_bytes, response_bytes):
+        with self._lock:
+            self._latency[operation].observe(seconds)
+            self._request_size[operation].observe(request_bytes)
+            self._response_size[operation].observe(response_bytes)
+
+    def record_error(self, operation, code):
+        with self._lock:
+            self._errors[operation, str(code)] += 1
+
+    def record_retry(self, operation):
+        with self._lock:
+            self._retries[operation] += 1
+
+    def record_token_refresh(self):
+        with self._lock:
+            self._token_refreshes += 1
+
+    def _render_histograms(self, lines, name, help_text, histograms):
+        lines.append('# HELP {} {}'.format(name, help_text))
+        lines.append('# TYPE {} histogram'.format(name))
+        for operation, histogram in sorted(histograms.items(), key=lambda item: str(item[0])):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(name, _labels(operation=operation, le=bound), cumulative))
+            lines.append('{}_sum{} {}'.format(name, _labels(operation=operation), histogram.sum))
+            lines.append('{}_count{} {}'.format(name, _labels(operation=operation), histogram.count))
+
+    def render(self):
+        prefix = self.prefix
+        lines = []
+        with self._lock:
+            self._render_histograms(
+                lines, prefix + '_request_duration_seconds', 'API round-trip time.', self._latency)
+            self._render_histograms(
+                lines, prefix + '_request_size_bytes', 'Size of API request bodies.', self._request_size)
+            self._render_histograms(
+                lines, prefix + '_response_size_bytes', 'Size of API response bodies.', self._response_size)
+
+            lines.append('# HELP {}_retries_total Attempts repeated by the retry policy.'.format(prefix))
+            lines.append('# TYPE {}_retries_total counter'.format(prefix))
+            for operation, count in sorted(self._retries.items(), key=lambda item: str(item[0])):
+                lines.append('{}_retries_total{} {}'.format(prefix, _labels(operation=operation), count))
+
+            lines.append('# HELP {}_errors_total Failed calls by error code.'.format(prefix))
+            lines.append('# TYPE {}_errors_total counter'.format(prefix))
+            for (operation, code), count in sorted(self._errors.items(), key=lambda item: str(item[0])):
+                lines.append('{}_errors_total{} {}'.format(prefix, _labels(operation=operation, code=code), count))
+
+            lines.append('# HELP {}_token_refreshes_total Tokens obtained with get_token.'.format(prefix))
+            lines.append('# TYPE {}_token_refreshes_total counter'.format(prefix))
+            lines.append('{}_token_refreshes_total {}'.format(prefix, self._token_refreshes))
+        return '\n'.join(lines) + '\n'
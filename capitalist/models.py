@@ -1,3 +1,6 @@
+from .utils import batch_records, to_amount, to_decimal
+
+
 class Model:
     __slots__ = []
 
@@ -21,7 +24,7 @@ class CurrencyRate(Model):
     def parse_json(cls, json_data, type_=None, **kwargs):
         return cls(
             type_,
-            json_data['amount'],
+            to_decimal(json_data['amount']),
             json_data['amountCur'],
             json_data['target'],
         )
@@ -39,31 +42,135 @@ class Account(Model):
 
     @classmethod
     def parse_json(cls, json_data, **kwargs):
+        currency = json_data['currency']
         return cls(
             json_data['name'],
-            json_data['balance'],
-            json_data['blockedAmount'],
-            json_data['currency'],
+            to_amount(json_data['balance'], currency),
+            to_amount(json_data['blockedAmount'], currency),
+            currency,
             json_data['number'],
         )
 
 
+class BatchRecordInfo(Model):
+    """State of a single record of a batch as reported by ``get_batch_info``."""
+    __slots__ = ['internal_id', 'state', 'data']
+
+    def __init__(self, internal_id, state, data):
+        self.internal_id = internal_id
+        self.state = state
+        self.data = data
+
+    @classmethod
+    def parse_json(cls, json_data, **kwargs):
+        return cls(
+            json_data['internalId'],
+            json_data['state'],
+            json_data.get('data'),
+        )
+
+
+class BatchSubmission:
+    """
+    Outcome of one batch submitted by ``Capitalist.import_batches``: either ``batch_id`` and ``response``
+    are set or ``error`` holds the exception that prevented the batch from being accepted.
+    """
+    __slots__ = ['index', 'batch_id', 'response', 'error']
+
+    def __init__(self, index, batch_id=None, response=None, error=None):
+        self.index = index
+        self.batch_id = batch_id
+        self.response = response
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def _compile_batch_record(payment_class):
+    """
+    Build ``as_batch_record`` specialized for ``payment_class``: the codename and field order are fixed in
+    the generated code. Records without ``None`` fields are formatted with a single f-string, the others
+    (only relevant with ``skip_none``) go through the generic implementation.
+
+    Also returns ``format_record(*values)``, the same f-string taking the field values as arguments, that
+    :class:`capitalist.batch.PaymentBatch` maps over its columns.
+    """
+    fields = payment_class.__slots__
+    lines = [
+        'def format_record({}):'.format(', '.join(fields)),
+        "    return _codename + f'{}'".format(''.join(';{{{}!s}}'.format(field) for field in fields)),
+        'def as_batch_record(self):',
+    ]
+    if payment_class.skip_none:
+        lines.append('    if {}:'.format(' or '.join('self.{} is None'.format(field) for field in fields)))
+        lines.append('        return _generic(self)')
+    lines.append("    return _codename + f'{}'".format(''.join(';{{self.{}!s}}'.format(field) for field in fields)))
+    namespace = {'_codename': str(payment_class.codename), '_generic': BasePayment.as_batch_record}
+    exec('\n'.join(lines), namespace)
+    as_batch_record = namespace['as_batch_record']
+    as_batch_record.__qualname__ = '{}.as_batch_record'.format(payment_class.__qualname__)
+    as_batch_record.compiled = True
+    return as_batch_record, namespace['format_record']
+
+
 class BasePayment:
+    """
+    A payment is serialized as its ``codename`` followed by the values of its ``__slots__`` in order.
+    With ``skip_none`` fields holding ``None`` (optional trailing fields) are left out of the record.
+
+    Subclasses relying on these attributes get an ``as_batch_record`` compiled for them when they are
+    defined; overriding ``get_codename``, ``get_payment_args`` or ``as_batch_record`` keeps the generic path.
+    """
     __slots__ = []
+    codename = None
+    skip_none = True
+    _format_record = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if 'as_batch_record' in cls.__dict__ or not (
+                cls.as_batch_record is BasePayment.as_batch_record or getattr(cls.as_batch_record, 'compiled', False)):
+            return
+        if (
+            cls.codename is not None and cls.__slots__
+            and cls.get_codename is BasePayment.get_codename
+            and cls.get_payment_args is BasePayment.get_payment_args
+        ):
+            cls.as_batch_record, cls._format_record = _compile_batch_record(cls)
+        else:
+            # Do not inherit a record layout compiled for a parent that is no longer valid.
+            cls.as_batch_record, cls._format_record = BasePayment.as_batch_record, None
 
     def get_codename(self):
-        raise NotImplementedError
+        if self.codename is None:
+            raise NotImplementedError
+        return self.codename
 
     def get_payment_args(self):
-        raise NotImplementedError
+        args = [getattr(self, field) for field in self.__slots__]
+        if self.skip_none:
+            return [arg for arg in args if arg is not None]
+        return args
 
     def as_batch_record(self):
         args = [str(self.get_codename())] + [str(a) for a in self.get_payment_args()]
         return ';'.join(args)
 
 
+def serialize_many(payments):
+    """
+    Batch text of ``payments`` (an iterable of payments or a :class:`capitalist.batch.PaymentBatch`): their
+    records joined with newlines into one string.
+    """
+    return '\n'.join(batch_records(payments))
+
+
 class InternalPayment(BasePayment):
     __slots__ = ['capitalist_id', 'amount', 'currency', 'internal_id', 'destination']
+    codename = 'CAPITALIST'
+    skip_none = False
 
     def __init__(self, capitalist_id, amount, currency, internal_id, destination):
         self.capitalist_id = capitalist_id
@@ -72,15 +179,10 @@ class InternalPayment(BasePayment):
         self.internal_id = internal_id
         self.destination = destination
 
-    def get_codename(self):
-        return 'CAPITALIST'
-
-    def get_payment_args(self):
-        return self.capitalist_id, self.amount, self.currency, self.internal_id, self.destination
-
 
 class WebMoneyPayment(BasePayment):
     __slots__ = ['wm_id', 'amount', 'currency', 'internal_id', 'destination', 'protection_code', 'protection_period']
+    codename = 'WM'
 
     def __init__(
             self, wm_id, amount, currency, internal_id, destination, protection_code=None, protection_period=None):
@@ -92,17 +194,10 @@ class WebMoneyPayment(BasePayment):
         self.protection_code = protection_code
         self.protection_period = protection_period
 
-    def get_codename(self):
-        return 'WM'
-
-    def get_payment_args(self):
-        args = [self.wm_id, self.amount, self.currency, self.internal_id, self.destination, self.protection_code,
-                self.protection_period]
-        return [arg for arg in args if arg is not None]
-
 
 class CardRussianPayment(BasePayment):
     __slots__ = ['card_number', 'amount', 'currency', 'internal_id', 'destination', 'first_name', 'last_name']
+    codename = 'RUCARD'
 
     def __init__(self, card_number, amount, currency, internal_id, destination, first_name, last_name):
         self.card_number = card_number
@@ -113,17 +208,10 @@ class CardRussianPayment(BasePayment):
         self.first_name = first_name
         self.last_name = last_name
 
-    def get_codename(self):
-        return 'RUCARD'
-
-    def get_payment_args(self):
-        args = [self.card_number, self.amount, self.currency, self.internal_id, self.destination, self.first_name,
-                self.last_name]
-        return [arg for arg in args if arg is not None]
-
 
 class Card2CardRussianPayment(BasePayment):
     __slots__ = ['card_number', 'amount', 'currency', 'internal_id', 'destination']
+    codename = 'RUCARDP2P_DYN'
 
     def __init__(self, card_number, amount, currency, internal_id, destination):
         self.card_number = card_number
@@ -132,16 +220,10 @@ class Card2CardRussianPayment(BasePayment):
         self.internal_id = internal_id
         self.destination = destination
 
-    def get_codename(self):
-        return 'RUCARDP2P_DYN'
-
-    def get_payment_args(self):
-        args = [self.card_number, self.amount, self.currency, self.internal_id, self.destination]
-        return [arg for arg in args if arg is not None]
-
 
 class CardUkrainianPayment(BasePayment):
     __slots__ = ['card_number', 'amount', 'currency', 'internal_id', 'destination']
+    codename = 'UKRCARD'
 
     def __init__(self, card_number, amount, currency, internal_id, destination):
         self.card_number = card_number
@@ -150,18 +232,13 @@ class CardUkrainianPayment(BasePayment):
         self.internal_id = internal_id
         self.destination = destination
 
-    def get_codename(self):
-        return 'UKRCARD'
-
-    def get_payment_args(self):
-        args = [self.card_number, self.amount, self.currency, self.internal_id, self.destination]
-        return [arg for arg in args if arg is not None]
-
 
 class CardWorldwidePayment(BasePayment):
     __slots__ = [
         'card_number', 'amount', 'currency', 'internal_id', 'destination', 'card_first_name', 'card_last_name',
         'birthday_date', 'address', 'country_alpha2', 'city', 'card_expiration_month', 'card_expiration_year']
+    codename = 'WORLDCARD'
+    skip_none = False
 
     def __init__(
             self, card_number, amount, currency, internal_id, destination, card_first_name, card_last_name,
@@ -180,23 +257,14 @@ class CardWorldwidePayment(BasePayment):
         self.card_expiration_month = card_expiration_month
         self.card_expiration_year = card_expiration_year
 
-    def get_codename(self):
-        return 'WORLDCARD'
-
-    def get_payment_args(self):
-        return (
-            self.card_number, self.amount, self.currency, self.internal_id, self.destination, self.card_first_name,
-            self.card_last_name, self.birthday_date, self.address, self.country_alpha2, self.city,
-            self.card_expiration_month, self.card_expiration_year)
-
 
 class CardCISPayment(CardWorldwidePayment):
-    def get_codename(self):
-        return 'SNGCARD'
+    codename = 'SNGCARD'
 
 
 class YandexMoneyPayment(BasePayment):
     __slots__ = ['number', 'amount', 'currency', 'internal_id', 'destination']
+    codename = 'YANDEX'
 
     def __init__(self, number, amount, currency, internal_id, destination):
         self.number = number
@@ -205,16 +273,10 @@ class YandexMoneyPayment(BasePayment):
         self.internal_id = internal_id
         self.destination = destination
 
-    def get_codename(self):
-        return 'YANDEX'
-
-    def get_payment_args(self):
-        args = [self.number, self.amount, self.currency, self.internal_id, self.destination]
-        return [arg for arg in args if arg is not None]
-
 
 class QiwiPayment(BasePayment):
     __slots__ = ['number', 'amount', 'currency', 'internal_id', 'destination']
+    codename = 'QIWI'
 
     def __init__(self, number, amount, currency, internal_id, destination):
         self.number = number
@@ -223,16 +285,10 @@ class QiwiPayment(BasePayment):
         self.internal_id = internal_id
         self.destination = destination
 
-    def get_codename(self):
-        return 'QIWI'
-
-    def get_payment_args(self):
-        args = [self.number, self.amount, self.currency, self.internal_id, self.destination]
-        return [arg for arg in args if arg is not None]
-
 
 class MegaFonPayment(BasePayment):
     __slots__ = ['number', 'amount', 'currency', 'internal_id', 'destination']
+    codename = 'MEGAFON'
 
     def __init__(self, number, amount, currency, internal_id, destination):
         self.number = number
@@ -241,16 +297,10 @@ class MegaFonPayment(BasePayment):
         self.internal_id = internal_id
         self.destination = destination
 
-    def get_codename(self):
-        return 'MEGAFON'
-
-    def get_payment_args(self):
-        args = [self.number, self.amount, self.currency, self.internal_id, self.destination]
-        return [arg for arg in args if arg is not None]
-
 
 class BeelinePayment(BasePayment):
     __slots__ = ['number', 'amount', 'currency', 'internal_id', 'destination']
+    codename = 'BEELINE'
 
     def __init__(self, number, amount, currency, internal_id, destination):
         self.number = number
@@ -259,16 +309,10 @@ class BeelinePayment(BasePayment):
         self.internal_id = internal_id
         self.destination = destination
 
-    def get_codename(self):
-        return 'BEELINE'
-
-    def get_payment_args(self):
-        args = [self.number, self.amount, self.currency, self.internal_id, self.destination]
-        return [arg for arg in args if arg is not None]
-
 
 class MtsPayment(BasePayment):
     __slots__ = ['number', 'amount', 'currency', 'internal_id', 'destination']
+    codename = 'MTS'
 
     def __init__(self, number, amount, currency, internal_id, destination):
         self.number = number
@@ -277,16 +321,10 @@ class MtsPayment(BasePayment):
         self.internal_id = internal_id
         self.destination = destination
 
-    def get_codename(self):
-        return 'MTS'
-
-    def get_payment_args(self):
-        args = [self.number, self.amount, self.currency, self.internal_id, self.destination]
-        return [arg for arg in args if arg is not None]
-
 
 class Tele2Payment(BasePayment):
     __slots__ = ['number', 'amount', 'currency', 'internal_id', 'destination']
+    codename = 'TELE2'
 
     def __init__(self, number, amount, currency, internal_id, destination):
         self.number = number
@@ -294,10 +332,3 @@ class Tele2Payment(BasePayment):
         self.currency = currency
         self.internal_id = internal_id
         self.destination = destination
-
-    def get_codename(self):
-        return 'TELE2'
-
-    def get_payment_args(self):
-        args = [self.number, self.amount, self.currency, self.internal_id, self.destination]
-        return [arg for arg in args if arg is not None]
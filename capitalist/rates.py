@@ -0,0 +1,95 @@
+import threading
+import time
+
+from .const import RATES_TTL
+from .exceptions import RateNotFound
+from .models import CurrencyRate
+from .utils import to_decimal
+
+
+class RateTable:
+    """
+    Currency rates from ``Capitalist.currency_rates()`` indexed by ``(type, amount_currency, target_currency)``
+    and cached for ``ttl`` seconds.
+
+    A rate means that one unit of ``target_currency`` costs ``amount`` of ``amount_currency``, so converting
+    between a pair works in both directions with the same rate.
+    """
+
+    def __init__(self, capitalist=None, ttl=RATES_TTL):
+        self.capitalist = capitalist
+        self.ttl = ttl
+        self._index = None
+        self._fetched_at = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_rates(cls, rates):
+        """Build a table from already fetched rates; it is never refreshed."""
+        table = cls(ttl=None)
+        table.load(rates)
+        return table
+
+    def load(self, rates):
+        self._index = {
+            (rate.type, rate.amount_currency, rate.target_currency): to_decimal(rate.amount) for rate in rates}
+        self._fetched_at = time.monotonic()
+
+    @property
+    def is_stale(self):
+        if self._index is None or self._fetched_at is None:
+            return True
+        return self.ttl is not None and time.monotonic() - self._fetched_at >= self.ttl
+
+    def refresh(self):
+        self.load(self.capitalist.currency_rates())
+
+    def invalidate(self):
+        """Make the next lookup fetch rates again. Tables built with ``from_rates`` keep their rates."""
+        self._fetched_at = None
+
+    @property
+    def index(self):
+        if self.is_stale and self.capitalist is not None:
+            with self._lock:
+                if self.is_stale:
+                    self.refresh()
+        return self._index or {}
+
+    def get(self, type_, amount_currency, target_currency):
+        """Rate as a ``Decimal``: the price of one ``target_currency`` in ``amount_currency``."""
+        try:
+            return self.index[type_, amount_currency, target_currency]
+        except KeyError:
+            raise RateNotFound(type_, amount_currency, target_currency)
+
+    def rates(self):
+        return [CurrencyRate(type_, amount, source, target) for (type_, source, target), amount in self.index.items()]
+
+    def _factor(self, from_currency, to_currency, side):
+        """Return ``(rate, multiply)``: converted amount is ``amount * rate`` or ``amount / rate``."""
+        index = self.index
+        rate = index.get((side, to_currency, from_currency))
+        if rate is not None:
+            return rate, True
+        rate = index.get((side, from_currency, to_currency))
+        if rate is not None:
+            return rate, False
+        raise RateNotFound(side, from_currency, to_currency)
+
+    def convert(self, amount, from_currency, to_currency, side='buy', quantize=None):
+        """
+        Convert ``amount`` of ``from_currency`` to ``to_currency`` using rates of type ``side``
+        (one of ``CurrencyRate.TYPES``). Pass ``quantize`` (e.g. ``Decimal('0.01')``) to round the result.
+        """
+        return self.convert_many([amount], from_currency, to_currency, side, quantize)[0]
+
+    def convert_many(self, amounts, from_currency, to_currency, side='buy', quantize=None):
+        """Convert every amount of an iterable with a single rate lookup."""
+        amounts = [to_decimal(amount) for amount in amounts]
+        if from_currency != to_currency:
+            rate, multiply = self._factor(from_currency, to_currency, side)
+            amounts = [amount * rate for amount in amounts] if multiply else [amount / rate for amount in amounts]
+        if quantize is not None:
+            amounts = [amount.quantize(quantize) for amount in amounts]
+        return amounts
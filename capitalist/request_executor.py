@@ -1,21 +1,98 @@
+try:
+    from orjson import loads as default_json_loads
+except ImportError:
+    from json import loads as default_json_loads
+
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
 
-from .const import TIMEOUT, __version__, API_URL
+from .const import TIMEOUT, __version__, API_URL, POOL_CONNECTIONS, POOL_MAXSIZE
 from .exceptions import RequestException
+from .metrics import Metrics
+
+
+class BaseRequestExecutor:
+    """
+    Circuit breaker and metrics bookkeeping around a single API call, shared by :class:`RequestExecutor` and
+    :class:`capitalist.aio.AsyncRequestExecutor`.
+    """
+    metrics = Metrics()
+    circuit_breaker = None
+
+    def _get_breaker(self, operation):
+        if self.circuit_breaker is None:
+            return None
+        return self.circuit_breaker.for_operation(operation)
+
+    def _before_request(self, operation):
+        """Let the breaker admit the call; returns the breaker and the start time (``None`` without metrics)."""
+        breaker = self._get_breaker(operation)
+        if breaker is not None:
+            breaker.before_call()
+        return breaker, time.perf_counter() if self.metrics.enabled else None
+
+    def _request_failed(self, operation, breaker, exc):
+        if breaker is not None:
+            breaker.record_failure()
+        if self.metrics.enabled:
+            self.metrics.record_error(operation, type(exc).__name__)
 
+    @staticmethod
+    def _request_cancelled(breaker):
+        # Cancelled (CancelledError is no Exception) or interrupted: no outcome, but free a probe slot.
+        if breaker is not None:
+            breaker.release()
+
+    def _request_succeeded(self, operation, breaker, started, sizes):
+        """Record a successful call; ``sizes`` returns its ``(request bytes, response bytes)``."""
+        if breaker is not None:
+            breaker.record_success()
+        if started is not None:
+            self.metrics.observe_request(operation, time.perf_counter() - started, *sizes())
+
+
+class RequestExecutor(BaseRequestExecutor):
+    """
+    Sends API calls through one ``requests.Session``; safe to share between threads.
+
+    Unless a ready ``session`` is given, connections are pooled by an adapter keeping up to ``pool_maxsize``
+    connections per host (``pool_block`` makes threads wait for a free one instead of opening extra
+    connections). Size it to the number of threads issuing calls. ``keep_alive=False`` closes the connection
+    after every call.
+
+    Responses are decoded with ``json_loads``, which receives the raw body bytes. By default it is
+    ``orjson.loads`` when orjson is installed and ``json.loads`` otherwise.
+    """
 
-class RequestExecutor:
     def __init__(
             self,
             timeout=TIMEOUT,
             api_url=API_URL,
             session=None,
+            circuit_breaker=None,
+            pool_connections=POOL_CONNECTIONS,
+            pool_maxsize=POOL_MAXSIZE,
+            pool_block=False,
+            keep_alive=True,
+            json_loads=default_json_loads,
     ):
         self.timeout = timeout
+        self.json_loads = json_loads
+        self.circuit_breaker = circuit_breaker
 
-        self._http = session or requests.Session()
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        self._http = session
         self._http.headers["User-Agent"] = "python-capitalist/{}".format(__version__)
         self._http.headers["X-Response-Format"] = "json"
+        if not keep_alive:
+            self._http.headers["Connection"] = "close"
 
         self.api_url = api_url
 
@@ -23,9 +100,29 @@ class RequestExecutor:
         """Call close on the underlying session."""
         return self._http.close()
 
+    @staticmethod
+    def _request_sent(exc):
+        """Whether the request behind ``exc`` may have reached the server: only a failed connect proves it did not."""
+        if isinstance(exc, requests.exceptions.ConnectTimeout):
+            return False
+        if isinstance(exc, requests.exceptions.ConnectionError) and exc.args:
+            # Connection refused, DNS failure: urllib3 gives up with a NewConnectionError (a ConnectTimeoutError).
+            return not isinstance(getattr(exc.args[0], 'reason', None), ConnectTimeoutError)
+        return True
+
     def request(self, **kwargs):
         """Issue the HTTP request capturing any errors that may occur."""
+        operation = (kwargs.get('data') or {}).get('operation')
+        breaker, started = self._before_request(operation)
         try:
-            return self._http.post(self.api_url, timeout=self.timeout, **kwargs).json()
+            response = self._http.post(self.api_url, timeout=self.timeout, **kwargs)
+            response_json = self.json_loads(response.content)
         except Exception as exc:
-            raise RequestException(exc, kwargs)
+            self._request_failed(operation, breaker, exc)
+            raise RequestException(exc, kwargs, request_sent=self._request_sent(exc))
+        except BaseException:
+            self._request_cancelled(breaker)
+            raise
+        self._request_succeeded(
+            operation, breaker, started, lambda: (len(response.request.body or b''), len(response.content)))
+        return response_json
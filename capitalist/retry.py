@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import random
+import time
+
+from .const import (
+    RETRY_TRIES, RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRY_DEADLINE, RETRYABLE_CODES, NON_IDEMPOTENT_OPERATIONS,
+)
+from .exceptions import RequestException, ResponseException
+
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy:
+    """
+    Retry budget of a single logical API call.
+
+    An attempt is retried when it fails with a ``RequestException`` or with a ``ResponseException`` whose code
+    is in ``retryable_codes``. Calls of ``non_idempotent_operations`` (batch imports) are retried after a
+    ``RequestException`` only if the request never reached the server: a read timeout or an unreadable
+    response may follow an accepted batch, and resubmitting it would pay twice.
+
+    Delays use full jitter: a random value between zero and ``base_delay * 2 ** attempt`` capped at
+    ``max_delay``. No retry is started once it would end after
+    ``deadline`` seconds from the first attempt, and at most ``tries`` attempts are made in total.
+
+    The same policy serves sync (:meth:`call`) and async (:meth:`call_async`) callers; the latter sleeps with
+    ``asyncio.sleep`` so the event loop is never blocked.
+    """
+
+    def __init__(
+            self,
+            tries=RETRY_TRIES,
+            base_delay=RETRY_BASE_DELAY,
+            max_delay=RETRY_MAX_DELAY,
+            deadline=RETRY_DEADLINE,
+            retryable_codes=RETRYABLE_CODES,
+            non_idempotent_operations=NON_IDEMPOTENT_OPERATIONS,
+            logger=logger,
+    ):
+        self.tries = tries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.retryable_codes = frozenset(retryable_codes)
+        self.non_idempotent_operations = frozenset(non_idempotent_operations)
+        self.logger = logger
+
+    def is_retryable(self, exc, operation=None):
+        if isinstance(exc, RequestException):
+            return operation not in self.non_idempotent_operations or not exc.request_sent
+        return isinstance(exc, ResponseException) and exc.code in self.retryable_codes
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def next_delay(self, attempt, started, exc, operation=None):
+        """Seconds to wait before the next attempt after ``attempt`` (0-based) failed, or ``None`` to give up."""
+        if attempt + 1 >= self.tries or not self.is_retryable(exc, operation):
+            return None
+        delay = self.backoff(attempt)
+        if self.deadline is not None and time.monotonic() - started + delay > self.deadline:
+            return None
+        if self.logger is not None:
+            self.logger.warning('%s, retrying in %.2f seconds...', exc, delay)
+        return delay
+
+    def call(self, func, *args, operation=None, **kwargs):
+        """Call ``func(*args, **kwargs)`` until it succeeds or the budget is spent; ``operation`` is the API call."""
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except Exception as exc:
+                delay = self.next_delay(attempt, started, exc, operation)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    async def call_async(self, func, *args, operation=None, **kwargs):
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                return await func(*args, **kwargs)
+            except Exception as exc:
+                delay = self.next_delay(attempt, started, exc, operation)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -1,16 +1,19 @@
+import logging
 import time
-from functools import wraps
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache, wraps
 
+from .const import CURRENCY_DECIMAL_PLACES, DEFAULT_DECIMAL_PLACES, CARD_WORLDWIDE, CARD_RU, CARD_UA  # noqa: F401
 
-CARD_WORLDWIDE = 0
-CARD_RU = 1
-CARD_UA = 2
+default_logger = logging.getLogger(__name__)
 
 
 def retry(exceptions, tries=4, delay=3, backoff=2, logger=None):
     """
     Retry calling the decorated function using an exponential backoff.
 
+    The client itself uses :class:`capitalist.retry.RetryPolicy`, which adds jitter and a total deadline.
+
     Args:
         exceptions: The exception to check. may be a tuple of
             exceptions to check.
@@ -18,7 +21,7 @@ def retry(exceptions, tries=4, delay=3, backoff=2, logger=None):
         delay: Initial delay between retries in seconds.
         backoff: Backoff multiplier (e.g. value of 2 will double the delay
             each retry).
-        logger: Logger to use. If None, print.
+        logger: Logger to use. If None, the logger of this module.
     """
     def deco_retry(f):
 
@@ -30,10 +33,7 @@ def retry(exceptions, tries=4, delay=3, backoff=2, logger=None):
                     return f(*args, **kwargs)
                 except exceptions as e:
                     msg = '{}, Retrying in {} seconds...'.format(e, mdelay)
-                    if logger:
-                        logger.warning(msg)
-                    else:
-                        print(msg)
+                    (logger or default_logger).warning(msg)
                     time.sleep(mdelay)
                     mtries -= 1
                     mdelay *= backoff
@@ -44,5 +44,116 @@ def retry(exceptions, tries=4, delay=3, backoff=2, logger=None):
     return deco_retry
 
 
-def guess_card_type(inn_bin: str):
-    pass
+def to_decimal(value):
+    """Convert a decoded JSON number or string to ``Decimal``; floats go through ``str`` to keep their digits."""
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float):
+        value = repr(value)
+    return Decimal(value)
+
+
+@lru_cache(maxsize=None)
+def currency_quantum(currency):
+    """Smallest unit of ``currency`` as a ``Decimal`` exponent, e.g. ``Decimal('0.01')``."""
+    return Decimal(1).scaleb(-CURRENCY_DECIMAL_PLACES.get(currency, DEFAULT_DECIMAL_PLACES))
+
+
+def to_amount(value, currency):
+    """
+    Monetary ``value`` as a ``Decimal`` with the decimal places of ``currency``, e.g. ``Decimal('10.00')``.
+    A value more precise than that (or a currency missing from ``CURRENCY_DECIMAL_PLACES``) is kept exact
+    rather than rounded.
+    """
+    value = to_decimal(value)
+    try:
+        quantized = value.quantize(currency_quantum(currency))
+    except InvalidOperation:
+        return value
+    return quantized if quantized == value else value
+
+
+def batch_records(payments):
+    """Batch records of a :class:`capitalist.batch.PaymentBatch` or of an iterable of payments, lazily."""
+    iter_records = getattr(payments, 'iter_records', None)
+    if iter_records is not None:
+        return iter_records()
+    return (payment.as_batch_record() for payment in payments)
+
+
+def chunk_batch_records(payments, max_records, max_bytes):
+    """
+    Lazily turn payments into lists of batch records, each list holding at most ``max_records`` records
+    and at most ``max_bytes`` bytes of UTF-8 batch text (newline separators included).
+
+    A single record larger than ``max_bytes`` is yielded as a chunk of its own.
+    """
+    records, size = [], 0
+    for record in batch_records(payments):
+        record_size = len(record) if record.isascii() else len(record.encode('utf-8'))
+        if records and (len(records) >= max_records or size + 1 + record_size > max_bytes):
+            yield records
+            records, size = [], 0
+        size += record_size + 1 if records else record_size
+        records.append(record)
+    if records:
+        yield records
+
+
+class BatchPages:
+    """
+    Offsets of the ``get_batch_info`` pages of one walk over a batch, shared by the sync and async clients.
+
+    The first page is requested alone. A full one means the server serves ``page_size`` records per page, so
+    up to ``prefetch`` pages are then kept requested ahead, and the first page shorter than that is the last.
+    A short first page is either the whole batch or the server capping the page size: the walk goes on with
+    pages of that size, one at a time until a full one arrives, and ends on an empty page.
+    """
+
+    def __init__(self, page_size, prefetch, start_offset=0):
+        self.page_size = page_size
+        self.prefetch = max(prefetch, 1)
+        self.next_offset = start_offset
+        self.ahead = 1
+        self.first = True
+        self.done = False
+
+    def to_request(self, pending):
+        """Offsets of the pages to request now, ``pending`` pages being requested already."""
+        offsets = []
+        while not self.done and pending + len(offsets) < self.ahead:
+            offsets.append(self.next_offset)
+            self.next_offset += self.page_size
+        return offsets
+
+    def received(self, offset, count):
+        """
+        Account ``count`` records of the page at ``offset``. Once :attr:`done` is set, the pages still pending
+        are past the end and can be dropped.
+        """
+        if count >= self.page_size:
+            self.ahead = self.prefetch
+        elif count and self.first:
+            self.page_size = count
+            self.next_offset = offset + count
+        else:
+            self.done = True
+        self.first = False
+
+
+def guess_card_type(inn_bin: str, default=None):
+    """
+    ``CARD_RU``, ``CARD_UA`` or ``CARD_WORLDWIDE`` for a card number or its BIN (6 digits at least), looked
+    up in the table of :func:`capitalist.bins.get_bin_table`; ``default`` when the BIN is not in the table.
+    """
+    from .bins import get_bin_table  # imported late so that ``python -m capitalist.bins`` runs cleanly
+
+    card_type = get_bin_table().lookup(inn_bin)
+    return default if card_type is None else card_type
+
+
+def guess_card_types(card_numbers, default=None):
+    """:func:`guess_card_type` of every card number of an iterable, as a list."""
+    from .bins import get_bin_table
+
+    return [default if card_type is None else card_type for card_type in get_bin_table().lookup_many(card_numbers)]
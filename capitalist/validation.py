@@ -0,0 +1,199 @@
+import inspect
+from collections import defaultdict
+from decimal import InvalidOperation
+from operator import attrgetter
+
+from .const import BATCH_CURRENCIES, CAPITALIST_ACCOUNT_TYPES
+from .exceptions import BatchValidationError
+from .utils import currency_quantum, to_decimal
+
+# ASCII digits to the Luhn value of the doubled digit, so the checksum is computed with bytes operations only.
+_LUHN_DOUBLED = bytes.maketrans(b'0123456789', bytes(digit * 2 - 9 if digit > 4 else digit * 2 for digit in range(10)))
+
+
+def is_luhn_valid(number):
+    """
+    Whether ``number`` is 12 to 19 digits with a valid Luhn check digit. Like ``as_batch_record``, it takes
+    the ``str()`` of the value, so card numbers stored as ``int`` are checked too.
+    """
+    number = str(number)
+    if not (12 <= len(number) <= 19 and number.isascii() and number.isdecimal()):
+        return False
+    kept = number[-1::-2].encode()
+    doubled = number[-2::-2].encode().translate(_LUHN_DOUBLED)
+    return (sum(kept) - ord('0') * len(kept) + sum(doubled)) % 10 == 0
+
+
+def is_capitalist_account(value, account_types=CAPITALIST_ACCOUNT_TYPES):
+    """Whether ``str(value)`` looks like a Capitalist account number: an account type letter followed by digits."""
+    value = str(value)
+    return (
+        len(value) >= 2 and value[0] in account_types
+        and value[1:].isdecimal() and value.isascii()
+    )
+
+
+class PaymentError:
+    __slots__ = ['index', 'internal_id', 'field', 'code', 'message']
+
+    def __init__(self, index, internal_id, field, code, message):
+        self.index = index
+        self.internal_id = internal_id
+        self.field = field
+        self.code = code
+        self.message = message
+
+    def __repr__(self):
+        return '<PaymentError #{} {}: {}>'.format(self.index, self.field, self.code)
+
+
+class ValidationResult:
+    """
+    Errors found by :meth:`BatchValidator.validate`, as lists of :class:`PaymentError` keyed by
+    ``internal_id`` of the payment. A payment without ``internal_id`` is keyed by its position instead.
+    """
+
+    def __init__(self, checked, errors):
+        self.checked = checked
+        self.errors = errors
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def __bool__(self):
+        return self.ok
+
+    def __len__(self):
+        return len(self.errors)
+
+    def __contains__(self, internal_id):
+        return internal_id in self.errors
+
+    def __getitem__(self, internal_id):
+        return self.errors[internal_id]
+
+    def invalid_ids(self):
+        return set(self.errors)
+
+    def raise_for_errors(self):
+        if self.errors:
+            raise BatchValidationError(self)
+
+
+class BatchValidator:
+    """
+    Check a whole batch locally before it is signed and uploaded, so a bad record does not cost a
+    resubmission round-trip.
+
+    Every payment is checked for its required fields (the payment class constructor arguments without a
+    default), a positive amount with no more decimal places than its currency allows, a currency from
+    ``currencies``, a Luhn-valid ``card_number`` and a well-formed Capitalist ``capitalist_id``. With
+    ``check_duplicates`` an ``internal_id`` used twice is reported too.
+
+    The checks of each payment class are resolved once, so a batch of any size is validated in one pass
+    over plain values. ``payments`` may be any iterable of payments or a :class:`capitalist.batch.PaymentBatch`.
+    """
+
+    def __init__(self, currencies=BATCH_CURRENCIES, account_types=CAPITALIST_ACCOUNT_TYPES, check_duplicates=True):
+        self.currencies = frozenset(currencies)
+        self.account_types = tuple(account_types)
+        self.check_duplicates = check_duplicates
+        self._plans = {}
+
+    def _plan(self, payment_class):
+        plan = self._plans.get(payment_class)
+        if plan is None:
+            fields = tuple(payment_class.__slots__)
+            parameters = inspect.signature(payment_class).parameters
+            required = tuple(
+                (index, field) for index, field in enumerate(fields)
+                if field in parameters and parameters[field].default is inspect.Parameter.empty
+            )
+            position = {field: index for index, field in enumerate(fields)}
+            plan = self._plans[payment_class] = (
+                fields, required, position.get('internal_id'), position.get('amount'), position.get('currency'),
+                position.get('card_number'), position.get('capitalist_id'),
+            )
+        return plan
+
+    @staticmethod
+    def _rows(payments):
+        """``(payment_class, values)`` of every payment, ``values`` being in ``__slots__`` order."""
+        columns = getattr(payments, 'columns', None)
+        if columns is not None:
+            payment_class = payments.payment_class
+            for values in zip(*[columns[field] for field in payments.fields]):
+                yield payment_class, values
+            return
+        getters = {}
+        for payment in payments:
+            payment_class = type(payment)
+            getter = getters.get(payment_class)
+            if getter is None:
+                fields = payment_class.__slots__
+                getter = getters[payment_class] = (
+                    attrgetter(*fields) if len(fields) > 1 else lambda payment: (getattr(payment, fields[0]),))
+            yield payment_class, getter(payment)
+
+    @staticmethod
+    def check_amount(amount, currency):
+        """Whether ``amount`` is a positive number with no more decimal places than ``currency`` has."""
+        if type(amount) is int:
+            return amount > 0
+        try:
+            value = to_decimal(amount)
+            quantum = currency_quantum(currency)
+            if not value.is_finite() or value <= 0:
+                return False
+            return value.as_tuple().exponent >= quantum.as_tuple().exponent or value == value.quantize(quantum)
+        except (InvalidOperation, TypeError, ValueError):
+            return False
+
+    def check(self, payment_class, values):
+        """List ``(field, code, message)`` of every problem of one payment given its field ``values``."""
+        _, required, _, amount_pos, currency_pos, card_pos, account_pos = self._plan(payment_class)
+        found = None
+        for position, field in required:
+            if values[position] is None or values[position] == '':
+                found = found or []
+                found.append((field, 'required', 'This field is required.'))
+        currency = values[currency_pos] if currency_pos is not None else None
+        if currency is not None and currency not in self.currencies:
+            found = found or []
+            found.append(('currency', 'invalid_currency', 'Unsupported currency {!r}.'.format(currency)))
+        amount = values[amount_pos] if amount_pos is not None else None
+        if amount is not None and not self.check_amount(amount, currency):
+            found = found or []
+            found.append(('amount', 'invalid_amount', 'Invalid amount {!r}.'.format(amount)))
+        if card_pos is not None and values[card_pos] is not None and not is_luhn_valid(values[card_pos]):
+            found = found or []
+            found.append(('card_number', 'invalid_card_number', 'Invalid card number.'))
+        if account_pos is not None and values[account_pos] is not None and not is_capitalist_account(
+                values[account_pos], self.account_types):
+            found = found or []
+            found.append(('capitalist_id', 'invalid_account', 'Invalid Capitalist account number.'))
+        return found or ()
+
+    def validate(self, payments):
+        """Check every payment and return a :class:`ValidationResult`."""
+        errors = defaultdict(list)
+        seen = set()
+        index = -1
+        check_duplicates = self.check_duplicates
+        for index, (payment_class, values) in enumerate(self._rows(payments)):
+            found = self.check(payment_class, values)
+            id_pos = self._plans[payment_class][2]
+            internal_id = values[id_pos] if id_pos is not None else None
+            if internal_id == '':
+                internal_id = None
+            if check_duplicates and internal_id is not None:
+                if internal_id in seen:
+                    found = list(found)
+                    found.append(('internal_id', 'duplicate_internal_id', 'Duplicate internal ID.'))
+                else:
+                    seen.add(internal_id)
+            if found:
+                errors[index if internal_id is None else internal_id].extend(
+                    PaymentError(index, internal_id, field, code, message) for field, code, message in found)
+        return ValidationResult(index + 1, dict(errors))